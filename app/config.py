@@ -4,5 +4,24 @@ import os
 class Settings(BaseModel):
     internal_key: str = os.getenv("SOVEREIGN_INTERNAL_KEY", "")
     timezone: str = os.getenv("TZ", "Africa/Johannesburg")
+    render_cache_max_bytes: int = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    render_cache_dir: str = os.getenv("RENDER_CACHE_DIR", "")
+    render_cache_disk_max_bytes: int = int(os.getenv("RENDER_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024)))
+    render_cache_disk_ttl_seconds: float = float(os.getenv("RENDER_CACHE_DISK_TTL_SECONDS", "0"))
+    branding_cache_max_bytes: int = int(os.getenv("BRANDING_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    archive_dir: str = os.getenv("ARCHIVE_DIR", "")
+    render_workers: int = int(os.getenv("RENDER_WORKERS", "0"))
+    render_queue_depth: int = int(os.getenv("RENDER_QUEUE_DEPTH", "64"))
+    render_timeout_seconds: float = float(os.getenv("RENDER_TIMEOUT_SECONDS", "30"))
+    render_worker_max_tasks: int = int(os.getenv("RENDER_WORKER_MAX_TASKS", "500"))
+    render_jobs_db: str = os.getenv("RENDER_JOBS_DB", "/tmp/sovereign-render-jobs.sqlite3")
+    render_job_concurrency: int = int(os.getenv("RENDER_JOB_CONCURRENCY", "2"))
+    render_job_max_queued: int = int(os.getenv("RENDER_JOB_MAX_QUEUED", "200"))
+    render_job_retention_seconds: float = float(os.getenv("RENDER_JOB_RETENTION_SECONDS", "86400"))
+    render_job_lease_seconds: float = float(os.getenv("RENDER_JOB_LEASE_SECONDS", "60"))
+    metrics_enabled: bool = os.getenv("METRICS_ENABLED", "1") not in ("0", "false", "")
+    warmup_enabled: bool = os.getenv("WARMUP_ENABLED", "1") not in ("0", "false", "")
+
+    tenant_config_dir: str = os.getenv("TENANT_CONFIG_DIR", "")
 
 settings = Settings()
@@ -1,23 +1,101 @@
-from fastapi import FastAPI, Depends, HTTPException
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from .security import require_internal_key
-from .schemas import ProposalGenerateIn, ProposalGenerateOut, BuildDocumentIn, RenderPayload, RenderOut
-from .templates_default import TEMPLATES
+from .streaming import ItemError, spool_body, iter_json_items
+from .responses import JSON, PDF, PNG, MULTIPART, b64, negotiate, binary_response, file_response, multipart_response
+from pydantic import ValidationError
+from .schemas import (
+    ProposalGenerateIn, ProposalGenerateOut, ProposalBatchItem, BuildDocumentIn, RenderPayload, RenderOut, RenderOutput,
+    RenderBatchIn, RenderBatchItem, RenderBatchOut, RenderJobOut, RasterProfileName, ArchivedDocument, DocumentListOut,
+    BuildRenderOut, PdfMode,
+)
 from .services.deal_os import generate_proposal
-from .services.compliance import validate_totals
-from .services.render import render_invoice_quote, b64
+from .services.templating import templates_for
+from .services.compliance import rules_for, validate_totals
+from .services.documents import build_document
+from .services.pdf_tools import can_linearize, pdf_stats
+from .services.jobs import QueueFull
+from .services.pool import PoolBusy, RenderTimeout
+from .services.metrics import MetricsMiddleware, render_metrics, stage
+from .config import settings
+from .services.raster_profiles import DEFAULT_PROFILE, PROFILES
+from .services.render_store import archive, pool, jobs, render_id, retain, load_payload, get_pdf, get_image, render_many, warm_up
 
-app = FastAPI(title="Sovereign AI", version="1.0.0")
+# READINESS
+readiness: dict = {"ready": False, "warmup_seconds": None, "error": None}
+
+def _warm_up() -> None:
+    started = time.monotonic()
+    try:
+        warm_up()
+    except Exception as e:
+        # a failed warm-up only costs latency on the first real render
+        readiness["error"] = f"{type(e).__name__}: {e}"
+    readiness["warmup_seconds"] = round(time.monotonic() - started, 3)
+    readiness["ready"] = True
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    jobs.start()
+    if settings.warmup_enabled:
+        readiness["ready"] = False
+        threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+    else:
+        readiness["ready"] = True
+    yield
+    jobs.stop()
+    pool.shutdown()
+    if archive is not None:
+        archive.close()
+
+app = FastAPI(title="Sovereign AI", version="1.0.0", lifespan=lifespan)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(PoolBusy)
+def pool_busy_handler(request: Request, exc: PoolBusy):
+    return JSONResponse(status_code=429, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+@app.exception_handler(QueueFull)
+def queue_full_handler(request: Request, exc: QueueFull):
+    return JSONResponse(status_code=429, content={"detail": str(exc)}, headers={"Retry-After": str(exc.retry_after)})
+
+@app.exception_handler(RenderTimeout)
+def render_timeout_handler(request: Request, exc: RenderTimeout):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
 
 @app.get("/health")
 def health():
     return {"ok": True}
 
+@app.get("/ready")
+def ready():
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
+
+@app.get("/metrics")
+def metrics():
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def root():
     return {"ok": True, "service": "Sovereign AI Core", "health": "/health"}
 
 @app.post("/v1/proposals/generate", response_model=ProposalGenerateOut, dependencies=[Depends(require_internal_key)])
 def proposals_generate(payload: ProposalGenerateIn):
+    return _generate_proposal(payload)
+
+def _generate_proposal(payload: ProposalGenerateIn) -> ProposalGenerateOut:
     # In production: pass identity/client from Supabase via Edge
     identity = {
         "company_name": payload.options.get("company_name", "YOUR COMPANY"),
@@ -31,84 +109,293 @@ def proposals_generate(payload: ProposalGenerateIn):
         client=client,
         proposal_ref=payload.proposal_ref,
         input_raw=payload.input_raw,
-        templates=TEMPLATES,
+        templates=templates_for(payload.user_id),
         options=payload.options,
+        rules=rules_for(payload.user_id),
     )
     return ProposalGenerateOut(**result)
 
+def _batch_proposal(index: int, item) -> ProposalBatchItem:
+    if isinstance(item, ItemError):
+        return ProposalBatchItem(index=index, error=str(item))
+    try:
+        payload = ProposalGenerateIn.model_validate(item)
+    except ValidationError as e:
+        return ProposalBatchItem(index=index, error=f"Invalid item: {e.errors(include_url=False, include_input=False)}")
+    try:
+        return ProposalBatchItem(index=index, proposal_ref=payload.proposal_ref, result=_generate_proposal(payload))
+    except Exception as e:
+        return ProposalBatchItem(index=index, proposal_ref=payload.proposal_ref, error=f"{type(e).__name__}: {e}")
+
+@app.post("/v1/proposals/generate-batch", dependencies=[Depends(require_internal_key)])
+async def proposals_generate_batch(request: Request):
+    """Body: NDJSON or a JSON array of ProposalGenerateIn. Streams one ProposalBatchItem
+    per line as each finishes; a failed item is reported without stopping the batch."""
+    body = await spool_body(request)
+
+    def lines():
+        try:
+            for i, item in enumerate(iter_json_items(body)):
+                yield _batch_proposal(i, item).model_dump_json() + "\n"
+        finally:
+            body.close()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def _build(payload: BuildDocumentIn) -> dict:
+    try:
+        return build_document(payload)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/v1/commerce/build-document", dependencies=[Depends(require_internal_key)])
-def build_document(payload: BuildDocumentIn):
-    proposal = payload.proposal or {}
-    client = payload.client_profile or {}
-    vf = payload.visual_financial_profile or {}
-    identity = payload.identity_profile or {}
-
-    company = {
-        "company_name": (identity.get("company_name") or "YOUR COMPANY").strip(),
-        "tagline": identity.get("tagline", ""),
-        "billing_address": vf.get("billing_address", ""),
-        "reg_number": vf.get("reg_number", ""),
-        "vat_number": vf.get("vat_number", ""),
-        "brand_accent_color": vf.get("brand_accent_color", "#0A66C2"),
-        "payment_terms_default": vf.get("payment_terms_default", "NET 7"),
-        "bank_details": vf.get("bank_details", {}) or {},
-        "email": identity.get("email", ""),
-        "website": identity.get("website", ""),
-        "signatory_name": identity.get("signatory_name", ""),
-        "signatory_role": identity.get("signatory_role", "Director"),
-    }
+def commerce_build_document(payload: BuildDocumentIn):
+    return _build(payload)
 
-    prefix = "INV" if payload.doc_type == "invoice" else "QUO"
-    suffix = (proposal.get("proposal_ref") or "00000").replace("SOP-", "").replace("/", "-")
-    doc_number = f"{prefix}-{suffix}"
-
-    import datetime as dt
-    today = dt.date.today()
-    issue_date = str(today)
-    due_date = str(today + dt.timedelta(days=7)) if payload.doc_type == "invoice" else None
-    valid_until = str(today + dt.timedelta(days=7)) if payload.doc_type == "quote" else None
-
-    items_in = (payload.overrides or {}).get("line_items") or [{"description": "SERVICES AS PER PROPOSAL", "unit_price": 0.0, "qty": 1}]
-    line_items = []
-    for i, it in enumerate(items_in, start=1):
-        unit = float(it.get("unit_price", 0.0))
-        qty = float(it.get("qty", 1))
-        total = round(unit * qty, 2)
-        line_items.append({"no": i, "description": it.get("description", ""), "unit_price": unit, "qty": qty, "total": total})
-
-    subtotal = round(sum(i["total"] for i in line_items), 2)
-    tax_rate = float((payload.overrides or {}).get("tax_rate", 0.0))
-    tax = round(subtotal * tax_rate, 2)
-    total = round(subtotal + tax, 2)
-
-    validate_totals(line_items, subtotal, tax, total)
-
-    proposal_ref = proposal.get("proposal_ref") or ""
-    if not proposal_ref:
-        raise HTTPException(status_code=400, detail="Proposal reference missing. Proposal linking is mandatory.")
-
-    return {
-        "doc_type": payload.doc_type,
-        "doc_number": doc_number,
-        "issue_date": issue_date,
-        "due_date": due_date,
-        "valid_until": valid_until,
-        "proposal_ref": proposal_ref,
-        "company": company,
-        "client": {
-            "client_name": client.get("client_name", ""),
-            "client_entity": client.get("client_entity", ""),
-            "client_email": client.get("client_email", ""),
-            "client_address": client.get("client_address", ""),
-        },
-        "line_items": line_items,
-        "subtotal": subtotal,
-        "tax": tax,
-        "total": total,
-        "notes": (payload.overrides or {}).get("notes"),
-    }
+@app.post("/v1/commerce/build-and-render", response_model=BuildRenderOut, dependencies=[Depends(require_internal_key)])
+def commerce_build_and_render(
+    payload: BuildDocumentIn,
+    response: Response,
+    outputs: list[RenderOutput] = Query(default=["pdf", "png"]),
+    pdf_mode: PdfMode = "default",
+    accept: str | None = Header(default=None),
+    if_none_match: str | None = Header(default=None),
+):
+    """build-document followed by render/invoice-quote in one call. The built document is
+    already a valid RenderPayload dict, so it is rendered as-is without a second validation."""
+    data = _build(payload)
+    with stage("render.id"):
+        rid = render_id(data)
+    return _render(data, rid, response, outputs, pdf_mode, accept, if_none_match, document=True)
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    return bool(if_none_match) and (if_none_match.strip() == "*" or etag in if_none_match)
+
+def _checked(payload: RenderPayload, where: str = "") -> dict:
+    """payload as a dict, with its totals checked: they come from the caller, unlike
+    build-document's, which are consistent by construction."""
+    data = payload.model_dump()
+    try:
+        validate_totals(data["line_items"], data["subtotal"], data["tax"], data["total"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{where}{e}")
+    return data
 
 @app.post("/v1/render/invoice-quote", response_model=RenderOut, dependencies=[Depends(require_internal_key)])
-def render_endpoint(payload: RenderPayload):
-    pdf_bytes, png_bytes = render_invoice_quote(payload.model_dump())
-    return RenderOut(pdf_bytes_base64=b64(pdf_bytes), png4k_bytes_base64=b64(png_bytes))
+def render_endpoint(
+    payload: RenderPayload,
+    response: Response,
+    outputs: list[RenderOutput] = Query(default=["pdf", "png"]),
+    pdf_mode: PdfMode = "default",
+    accept: str | None = Header(default=None),
+    if_none_match: str | None = Header(default=None),
+):
+    data = _checked(payload)
+    with stage("render.id"):
+        rid = render_id(data)
+    return _render(data, rid, response, outputs, pdf_mode, accept, if_none_match)
+
+def _render(
+    data: dict,
+    rid: str,
+    response: Response,
+    outputs: list[RenderOutput],
+    pdf_mode: str,
+    accept: str | None,
+    if_none_match: str | None,
+    document: bool = False,
+):
+    # document=True: build-and-render, which also returns the built document
+    media = negotiate(accept)
+    if media == PDF:
+        outputs = ["pdf"]
+    elif media == PNG:
+        outputs = ["png"]
+    if pdf_mode == "linearized" and "pdf" in outputs and not can_linearize():
+        raise HTTPException(status_code=501, detail="Linearized PDFs need pikepdf installed on the server")
+    kinds = "+".join(sorted(k if k != "pdf" or pdf_mode == "default" else f"pdf-{pdf_mode}" for k in set(outputs)))
+    if document:
+        kinds += ".doc"
+    if media == JSON:
+        etag = f'"{rid}.{kinds}.json"'
+    elif media in (PDF, PNG):
+        etag = f'"{rid}.{kinds}"'
+    else:
+        etag = f'"{rid}.{kinds}.multipart"'
+    headers = {"ETag": etag, "Vary": "Accept", "X-Render-Id": rid}
+    if document and media in (PDF, PNG):
+        # the JSON and multipart shapes carry the document itself; header values are latin-1
+        headers["X-Doc-Number"] = quote(data["doc_number"], safe="")
+    if _etag_matches(if_none_match, etag):
+        # 304 is only for GET and HEAD; a POST whose precondition fails gets 412 (RFC 9110 13.1.2)
+        return Response(status_code=412, headers=headers)
+
+    pdf_bytes = get_pdf(data, rid, pdf_mode) if "pdf" in outputs else None
+    png_bytes = get_image(data, rid) if "png" in outputs else None
+    # keep the payload so GET /v1/render/{render_id}/image can serve any profile for this render_id
+    retain(data, rid)
+    ratio = None
+    if pdf_bytes is not None:
+        headers["X-Pdf-Bytes"] = str(len(pdf_bytes))
+        if pdf_mode != "default":
+            size, raw = pdf_stats(pdf_bytes)
+            ratio = round(raw / size, 2)
+            headers["X-Pdf-Compression-Ratio"] = f"{ratio:.2f}"
+
+    doc_number = data["doc_number"]
+    if media == PDF:
+        return binary_response(pdf_bytes, PDF, f"{doc_number}.pdf", headers)
+    if media == PNG:
+        return binary_response(png_bytes, PNG, f"{doc_number}.png", headers)
+    if media != JSON:
+        parts = []
+        if document:
+            parts.append((JSON, f"{doc_number}.json", json.dumps(data, separators=(",", ":")).encode("utf-8")))
+        if pdf_bytes is not None:
+            parts.append((PDF, f"{doc_number}.pdf", pdf_bytes))
+        if png_bytes is not None:
+            parts.append((PNG, f"{doc_number}.png", png_bytes))
+        return multipart_response(parts, f"render-{rid[:32]}", headers)
+
+    response.headers.update(headers)
+    with stage("render.b64"):
+        pdf_b64 = b64(pdf_bytes) if pdf_bytes is not None else None
+        png_b64 = b64(png_bytes) if png_bytes is not None else None
+    out = RenderOut(
+        render_id=rid,
+        pdf_bytes_base64=pdf_b64,
+        png4k_bytes_base64=png_b64,
+        pdf_size=len(pdf_bytes) if pdf_bytes is not None else None,
+        pdf_compression_ratio=ratio,
+    )
+    return BuildRenderOut(**out.model_dump(), document=data) if document else out
+
+@app.get("/v1/render/{render_id}/image", dependencies=[Depends(require_internal_key)])
+def render_image(render_id: str, profile: RasterProfileName = DEFAULT_PROFILE, if_none_match: str | None = Header(default=None)):
+    data = load_payload(render_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired render_id. Re-submit the render.")
+    etag = f'"{render_id}.{profile}"'
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    p = PROFILES[profile]
+    name = data["doc_number"] if profile == DEFAULT_PROFILE else f"{data['doc_number']}.{profile}"
+    return binary_response(get_image(data, render_id, profile), p.media_type, f"{name}.{p.extension}", {"ETag": etag})
+
+def _batch_item(index: int, rid: str, result: dict[str, bytes] | None, error: BaseException | None) -> RenderBatchItem:
+    if error is not None:
+        return RenderBatchItem(index=index, render_id=rid, error=f"{type(error).__name__}: {error}")
+    return RenderBatchItem(
+        index=index,
+        render_id=rid,
+        pdf_bytes_base64=b64(result["pdf"]) if "pdf" in result else None,
+        png4k_bytes_base64=b64(result["png"]) if "png" in result else None,
+    )
+
+@app.post("/v1/render/batch", response_model=RenderBatchOut, dependencies=[Depends(require_internal_key)])
+def render_batch(payload: RenderBatchIn, stream: bool = False):
+    outputs = sorted(set(payload.outputs))
+    items = [_checked(p, f"items[{i}]: ") for i, p in enumerate(payload.items)]
+    results = render_many(items, outputs, ordered=not stream)
+    if stream:
+        # NDJSON, one RenderBatchItem per line in completion order
+        lines = (_batch_item(*r).model_dump_json() + "\n" for r in results)
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+    return RenderBatchOut(results=[_batch_item(*r) for r in results])
+
+@app.post("/v1/render/jobs", response_model=RenderJobOut, status_code=202, dependencies=[Depends(require_internal_key)])
+def render_job_submit(payload: RenderPayload, outputs: list[RenderOutput] = Query(default=["pdf", "png"])):
+    return RenderJobOut(**jobs.submit(_checked(payload), sorted(set(outputs))))
+
+@app.get("/v1/render/jobs/{job_id}", response_model=RenderJobOut, dependencies=[Depends(require_internal_key)])
+async def render_job_status(job_id: str, wait: float = Query(default=0.0, ge=0.0, le=30.0)):
+    # long-poll: hold the request until the job settles or `wait` seconds pass. The
+    # lookup takes a lock and reads SQLite, so it runs in the threadpool; the wait
+    # between lookups stays on the loop, so a poller does not pin a thread for 30s
+    deadline = time.monotonic() + wait
+    while True:
+        job = await run_in_threadpool(jobs.get, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Unknown job_id")
+        if job["status"] in ("done", "failed") or time.monotonic() >= deadline:
+            return RenderJobOut(**job)
+        await asyncio.sleep(0.1)
+
+@app.get("/v1/render/jobs/{job_id}/result", dependencies=[Depends(require_internal_key)])
+def render_job_result(job_id: str, accept: str | None = Header(default=None)):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job_id")
+    result = jobs.result(job_id) if job["status"] == "done" else None
+    if result is None:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+
+    media = negotiate(accept)
+    headers = {"X-Render-Id": job["render_id"], "Vary": "Accept"}
+    name = job_id
+    if media == PDF and "pdf" in result:
+        return binary_response(result["pdf"], PDF, f"{name}.pdf", headers)
+    if media == PNG and "png" in result:
+        return binary_response(result["png"], PNG, f"{name}.png", headers)
+    if media == MULTIPART:
+        parts = [(PDF if k == "pdf" else PNG, f"{name}.{k}", v) for k, v in sorted(result.items())]
+        return multipart_response(parts, f"render-{job['render_id'][:32]}", headers)
+    if media != JSON:
+        raise HTTPException(status_code=406, detail=f"Job did not produce {media}")
+    return JSONResponse(
+        RenderOut(
+            render_id=job["render_id"],
+            pdf_bytes_base64=b64(result["pdf"]) if "pdf" in result else None,
+            png4k_bytes_base64=b64(result["png"]) if "png" in result else None,
+        ).model_dump(),
+        headers=headers,
+    )
+
+# DOCUMENT ARCHIVE
+def _archive():
+    if archive is None:
+        raise HTTPException(status_code=404, detail="Document archive is not enabled (set ARCHIVE_DIR)")
+    return archive
+
+@app.get("/v1/documents", response_model=DocumentListOut, dependencies=[Depends(require_internal_key)])
+def documents_by_proposal(proposal_ref: str, user_id: str = ""):
+    docs = _archive().by_proposal(user_id, proposal_ref)
+    scope = f"?user_id={quote(user_id, safe='')}" if user_id else ""
+    return DocumentListOut(
+        user_id=user_id,
+        proposal_ref=proposal_ref,
+        documents=[ArchivedDocument(**d, url=f"/v1/documents/{quote(d['doc_number'], safe='')}.{d['kind']}{scope}") for d in docs],
+    )
+
+def _not_modified(doc: dict, etag: str, if_none_match: str | None, if_modified_since: str | None) -> bool:
+    # If-Modified-Since only counts when there is no If-None-Match (RFC 9110 13.1.3)
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if if_modified_since:
+        try:
+            return int(doc["created_at"]) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _document_file(user_id: str, doc_number: str, kind: str, media_type: str, if_none_match: str | None, if_modified_since: str | None):
+    store = _archive()
+    doc = store.get(user_id, doc_number, kind)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="No archived document with that number")
+    etag = f'"{doc["sha256"]}"'
+    headers = {"ETag": etag, "Last-Modified": formatdate(doc["created_at"], usegmt=True), "X-Render-Id": doc["render_id"]}
+    if _not_modified(doc, etag, if_none_match, if_modified_since):
+        return Response(status_code=304, headers=headers)
+    path = store.path(doc["sha256"], kind)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Archived file is missing. Re-submit the render.")
+    return file_response(path, media_type, f"{doc_number}.{kind}", headers)
+
+@app.api_route("/v1/documents/{doc_number}.pdf", methods=["GET", "HEAD"], dependencies=[Depends(require_internal_key)])
+def document_pdf(doc_number: str, user_id: str = "", if_none_match: str | None = Header(default=None), if_modified_since: str | None = Header(default=None)):
+    return _document_file(user_id, doc_number, "pdf", PDF, if_none_match, if_modified_since)
+
+@app.api_route("/v1/documents/{doc_number}.png", methods=["GET", "HEAD"], dependencies=[Depends(require_internal_key)])
+def document_png(doc_number: str, user_id: str = "", if_none_match: str | None = Header(default=None), if_modified_since: str | None = Header(default=None)):
+    return _document_file(user_id, doc_number, "png", PNG, if_none_match, if_modified_since)
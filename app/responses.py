@@ -0,0 +1,80 @@
+import base64
+from typing import AsyncIterator, Optional
+from urllib.parse import quote
+from fastapi.responses import FileResponse, StreamingResponse
+
+CHUNK_SIZE = 64 * 1024
+
+JSON = "application/json"
+PDF = "application/pdf"
+PNG = "image/png"
+MULTIPART = "multipart/mixed"
+
+_OFFERS = (JSON, PDF, PNG, MULTIPART)
+
+def b64(bytes_in: bytes) -> str:
+    return base64.b64encode(bytes_in).decode("utf-8")
+
+def negotiate(accept: Optional[str]) -> str:
+    """Pick the response media type from an Accept header. Anything unrecognised,
+    including */* and a missing header, gets the JSON/base64 compatibility shape."""
+    best, best_q = JSON, 0.0
+    for i, part in enumerate((accept or "").split(",")):
+        fields = [f.strip() for f in part.split(";")]
+        media = fields[0].lower()
+        q = 1.0
+        for f in fields[1:]:
+            if f.startswith("q="):
+                try:
+                    q = float(f[2:])
+                except ValueError:
+                    q = 0.0
+        if media in _OFFERS and q > best_q:
+            best, best_q = media, q
+    return best
+
+async def _chunks(*parts: bytes) -> AsyncIterator[bytes]:
+    # async so Starlette does not hop to the threadpool for every chunk
+    for data in parts:
+        view = memoryview(data)
+        for i in range(0, len(view), CHUNK_SIZE):
+            yield view[i:i + CHUNK_SIZE]
+
+def _disposition(filename: str) -> str:
+    """Header values are latin-1, so a non-ASCII name goes in an RFC 5987 filename*
+    with an ASCII fallback in filename= (RFC 6266)."""
+    name = "".join(ch for ch in filename if ch not in '"\\' and ch.isprintable())
+    fallback = name.encode("ascii", "replace").decode("ascii").replace("?", "_")
+    if fallback == name:
+        return f'inline; filename="{name}"'
+    return f"inline; filename=\"{fallback}\"; filename*=UTF-8''{quote(name, safe='')}"
+
+def binary_response(data: bytes, media_type: str, filename: str, headers: dict[str, str]) -> StreamingResponse:
+    return StreamingResponse(
+        _chunks(data),
+        media_type=media_type,
+        headers={**headers, "Content-Length": str(len(data)), "Content-Disposition": _disposition(filename)},
+    )
+
+def file_response(path: str, media_type: str, filename: str, headers: dict[str, str]) -> FileResponse:
+    """Streamed from disk in chunks, with Range support; the file is never read whole."""
+    return FileResponse(path, media_type=media_type, headers={**headers, "Content-Disposition": _disposition(filename)})
+
+def multipart_response(parts: list[tuple[str, str, bytes]], boundary: str, headers: dict[str, str]) -> StreamingResponse:
+    """parts: (media_type, filename, body). Bodies are streamed as-is, never concatenated."""
+    chunks: list[bytes] = []
+    for media_type, filename, body in parts:
+        chunks.append((
+            f"--{boundary}\r\n"
+            f"Content-Type: {media_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Content-Disposition: {_disposition(filename)}\r\n\r\n"
+        ).encode("utf-8"))
+        chunks.append(body)
+        chunks.append(b"\r\n")
+    chunks.append(f"--{boundary}--\r\n".encode("ascii"))
+    return StreamingResponse(
+        _chunks(*chunks),
+        media_type=f"{MULTIPART}; boundary={boundary}",
+        headers={**headers, "Content-Length": str(sum(len(c) for c in chunks))},
+    )
@@ -2,6 +2,10 @@ from pydantic import BaseModel, Field
 from typing import Any, Literal, Optional
 
 DocType = Literal["quote", "invoice"]
+RenderOutput = Literal["pdf", "png"]
+RasterProfileName = Literal["4k", "hd", "thumb"]
+PdfMode = Literal["default", "compact", "linearized"]
+JobStatus = Literal["queued", "running", "done", "failed"]
 
 class ProposalGenerateIn(BaseModel):
     user_id: str
@@ -17,6 +21,13 @@ class ProposalGenerateOut(BaseModel):
     output_email: str
     output_dm: str
     warnings: list[str] = Field(default_factory=list)
+    compliance_findings: list[dict[str, Any]] = Field(default_factory=list)
+
+class ProposalBatchItem(BaseModel):
+    index: int
+    proposal_ref: Optional[str] = None
+    result: Optional[ProposalGenerateOut] = None
+    error: Optional[str] = None
 
 class BuildDocumentIn(BaseModel):
     user_id: str
@@ -52,7 +63,58 @@ class RenderPayload(BaseModel):
     tax: float
     total: float
     notes: Optional[str] = None
+    # the tenant; scopes the document number in the archive
+    user_id: Optional[str] = None
 
 class RenderOut(BaseModel):
-    pdf_bytes_base64: str
-    png4k_bytes_base64: str
+    render_id: str
+    pdf_bytes_base64: Optional[str] = None
+    png4k_bytes_base64: Optional[str] = None
+    pdf_size: Optional[int] = None
+    # uncompressed / actual size; compact and linearized modes only
+    pdf_compression_ratio: Optional[float] = None
+
+class BuildRenderOut(RenderOut):
+    # the built RenderPayload, as /v1/commerce/build-document returns it
+    document: dict[str, Any]
+
+class ArchivedDocument(BaseModel):
+    user_id: str
+    doc_number: str
+    kind: RenderOutput
+    url: str
+    sha256: str
+    size: int
+    render_id: str
+    proposal_ref: str
+    doc_type: DocType
+    created_at: float
+
+class DocumentListOut(BaseModel):
+    user_id: str
+    proposal_ref: str
+    documents: list[ArchivedDocument]
+
+class RenderBatchIn(BaseModel):
+    items: list[RenderPayload]
+    outputs: list[RenderOutput] = Field(default_factory=lambda: ["pdf", "png"])
+
+class RenderBatchItem(BaseModel):
+    index: int
+    render_id: str
+    pdf_bytes_base64: Optional[str] = None
+    png4k_bytes_base64: Optional[str] = None
+    error: Optional[str] = None
+
+class RenderBatchOut(BaseModel):
+    results: list[RenderBatchItem]
+
+class RenderJobOut(BaseModel):
+    job_id: str
+    status: JobStatus
+    outputs: list[RenderOutput]
+    render_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
@@ -0,0 +1,103 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    user_id TEXT NOT NULL,
+    doc_number TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    render_id TEXT NOT NULL,
+    proposal_ref TEXT NOT NULL,
+    doc_type TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (user_id, doc_number, kind)
+);
+CREATE INDEX IF NOT EXISTS documents_proposal_ref ON documents (user_id, proposal_ref, created_at);
+"""
+
+# an index from before documents were scoped by user_id; its rows belong to no tenant
+_MIGRATE_UNSCOPED = """
+DROP INDEX IF EXISTS documents_proposal_ref;
+ALTER TABLE documents RENAME TO documents_unscoped;
+"""
+
+_COLS = "user_id, doc_number, kind, sha256, size, render_id, proposal_ref, doc_type, created_at"
+
+class DocumentArchive:
+    """Rendered files on local disk, stored once per content hash under
+    objects/<aa>/<bb>/<sha256>.<kind>, with a SQLite index by tenant (the payload's
+    user_id, "" without one), document number and proposal reference. Tenants
+    number documents independently, so every lookup is scoped to one tenant.
+    Re-rendering a document number points it at the new file."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.root, "index.sqlite3"), check_same_thread=False, isolation_level=None)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            have = {r["name"] for r in self._db.execute("PRAGMA table_info(documents)")}
+            if have and "user_id" not in have:
+                self._db.executescript(_MIGRATE_UNSCOPED)
+                self._db.executescript(_SCHEMA)
+                self._db.execute(f"INSERT INTO documents ({_COLS}) SELECT '', {_COLS.split(', ', 1)[1]} FROM documents_unscoped")
+                self._db.execute("DROP TABLE documents_unscoped")
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def path(self, sha256: str, kind: str) -> str:
+        return os.path.join(self.root, "objects", sha256[:2], sha256[2:4], f"{sha256}.{kind}")
+
+    def _write(self, path: str, data: bytes) -> None:
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def store(self, payload: dict[str, Any], rid: str, kind: str, data: bytes) -> dict[str, Any]:
+        sha = hashlib.sha256(data).hexdigest()
+        self._write(self.path(sha, kind), data)
+        row = (payload.get("user_id") or "", payload["doc_number"], kind, sha, len(data), rid, payload.get("proposal_ref") or "", payload["doc_type"], time.time())
+        with self._lock:
+            self._conn().execute(f"INSERT OR REPLACE INTO documents ({_COLS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+        return dict(zip(_COLS.split(", "), row))
+
+    def get(self, user_id: str, doc_number: str, kind: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            row = self._conn().execute(
+                f"SELECT {_COLS} FROM documents WHERE user_id = ? AND doc_number = ? AND kind = ?", (user_id, doc_number, kind)
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def by_proposal(self, user_id: str, proposal_ref: str) -> list[dict[str, Any]]:
+        with self._lock:
+            rows = self._conn().execute(
+                f"SELECT {_COLS} FROM documents WHERE user_id = ? AND proposal_ref = ? ORDER BY created_at, doc_number, kind",
+                (user_id, proposal_ref),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
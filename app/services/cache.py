@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+def canonical_hash(obj: Any, *parts: str) -> str:
+    h = hashlib.sha256()
+    h.update(json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8"))
+    for p in parts:
+        h.update(b"\x00" + p.encode("utf-8"))
+    return h.hexdigest()
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Optional[bytes] = None
+        self.error: Optional[BaseException] = None
+
+# a sweep trims the disk tier to this share of disk_max_bytes, so it does not run on every put
+_DISK_LOW_WATER = 0.9
+# with a TTL, expired files are swept at most this often
+_DISK_SWEEP_SECONDS = 60.0
+
+class ByteCache:
+    """LRU of bytes values bounded by total size, with an optional on-disk tier
+    and single-flight creation (concurrent misses on one key share one call).
+
+    The disk tier is bounded by disk_max_bytes (0 = unbounded): past it, the
+    least recently used files (by mtime, which a disk hit refreshes) are deleted.
+    With disk_ttl_seconds, files not used for that long are deleted as well."""
+
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None, disk_max_bytes: int = 0, disk_ttl_seconds: float = 0.0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir or None
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_ttl_seconds = disk_ttl_seconds
+        # None until the directory is first scanned; other processes may share it, so it is an estimate
+        self._disk_size: Optional[int] = None
+        self._disk_swept = 0.0
+        self._disk_lock = threading.Lock()
+        self._mem: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._flights: dict[str, _Flight] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def _mem_put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._mem[key] = value
+        self._size += len(value)
+        while self._size > self.max_bytes:
+            _, evicted = self._mem.popitem(last=False)
+            self._size -= len(evicted)
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+        except FileNotFoundError:
+            return None
+        if self.disk_max_bytes or self.disk_ttl_seconds:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+        return value
+
+    def _disk_put(self, key: str, value: bytes) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self._disk_trim(len(value))
+
+    def _disk_files(self) -> list[tuple[float, int, str]]:
+        """(mtime, size, path) of every cached file."""
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if not entry.is_dir():
+                continue
+            for f in os.scandir(entry.path):
+                if f.name.endswith(".tmp"):
+                    # another thread's write in progress
+                    continue
+                try:
+                    st = f.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, f.path))
+        return files
+
+    def _disk_trim(self, added: int) -> None:
+        if not (self.disk_max_bytes or self.disk_ttl_seconds):
+            return
+        now = time.time()
+        with self._disk_lock:
+            if self._disk_size is not None:
+                self._disk_size += added
+            over = self.disk_max_bytes and (self._disk_size is None or self._disk_size > self.disk_max_bytes)
+            expired = self.disk_ttl_seconds and now - self._disk_swept >= min(self.disk_ttl_seconds, _DISK_SWEEP_SECONDS)
+            if not (over or expired):
+                return
+            self._disk_swept = now
+            files = sorted(self._disk_files())
+            size = sum(f[1] for f in files)
+            target = self.disk_max_bytes * _DISK_LOW_WATER if self.disk_max_bytes and size > self.disk_max_bytes else None
+            for mtime, fsize, path in files:
+                stale = self.disk_ttl_seconds and now - mtime > self.disk_ttl_seconds
+                if not stale and (target is None or size <= target):
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                size -= fsize
+            self._disk_size = size
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._mem.get(key)
+            if value is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return value
+        value = self._disk_get(key)
+        with self._lock:
+            if value is not None:
+                self._mem_put(key, value)
+                self.hits += 1
+            else:
+                self.misses += 1
+        return value
+
+    def put(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._mem_put(key, value)
+        self._disk_put(key, value)
+
+    def get_or_create(self, key: str, factory: Callable[[], bytes]) -> bytes:
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            value = self._mem.get(key)
+            if value is not None:
+                return value
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = factory()
+            self.put(key, value)
+            flight.value = value
+            return value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._mem), "bytes": self._size, "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
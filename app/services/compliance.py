@@ -1,24 +1,96 @@
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, Optional
+from .tenant_config import tenant_config
+from .totals import check_totals
+
 WEAK_PHRASES = [
     "just checking", "hope you", "if possible", "sorry", "i was wondering",
     "please let me know if you can", "no worries"
 ]
 
-def enforce_no_weak_language(text: str) -> str:
-    t = text
-    for p in WEAK_PHRASES:
-        t = t.replace(p, "")
-        t = t.replace(p.title(), "")
-    return t
-
-def require_cta(text: str) -> None:
-    must = ["next step", "let's", "lets", "schedule", "confirm", "approve"]
-    low = text.lower()
-    if not any(m in low for m in must):
+CTA_PHRASES = ["next step", "let's", "lets", "schedule", "confirm", "approve"]
+
+@dataclass(frozen=True)
+class Finding:
+    rule: str
+    phrase: str
+    start: int
+    end: int
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+def _trie_pattern(phrases: list[str]) -> str:
+    """Alternation shaped as a trie, so matching cost grows with phrase depth
+    rather than with the number of phrases."""
+    trie: dict[str, dict] = {}
+    for p in phrases:
+        node = trie
+        for ch in p:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node: dict[str, dict]) -> str:
+        alts = [re.escape(ch) + emit(sub) for ch, sub in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        if "" in node:
+            # a shorter phrase ends here; prefer the longer match, fall back to this one
+            return "(?:" + body + ")?"
+        return body
+
+    return emit(trie)
+
+class RuleSet:
+    """Weak-language and CTA rules compiled into one case-insensitive matcher.
+    check() cleans and validates text in a single pass."""
+
+    def __init__(self, weak_phrases: list[str], cta_phrases: list[str]):
+        weak = sorted({p.lower() for p in weak_phrases if p})
+        cta = sorted({p.lower() for p in cta_phrases if p})
+        alts = []
+        if weak:
+            alts.append(f"(?P<weak>{_trie_pattern(weak)})(?P<trail>[ \\t]*)")
+        if cta:
+            alts.append(f"(?P<cta>{_trie_pattern(cta)})")
+        self._rx = re.compile("|".join(alts) or r"(?!)", re.IGNORECASE)
+
+    def check(self, text: str) -> tuple[str, list[Finding], bool]:
+        """Returns (text with weak phrases removed, findings, whether a CTA was found).
+        Finding positions refer to the input text."""
+        findings: list[Finding] = []
+
+        def on_match(m: re.Match) -> str:
+            if m.lastgroup == "cta":
+                findings.append(Finding("cta", m.group(0), m.start(), m.end()))
+                return m.group(0)
+            findings.append(Finding("weak_language", m.group("weak"), m.start(), m.end("weak")))
+            # drop the phrase without leaving a double space behind
+            start = m.start()
+            if start == 0 or text[start - 1].isspace():
+                return ""
+            return m.group("trail")[:1]
+
+        cleaned = self._rx.sub(on_match, text)
+        return cleaned, findings, any(f.rule == "cta" for f in findings)
+
+def compile_rule_set(raw: dict[str, Any]) -> RuleSet:
+    return RuleSet(raw.get("weak_phrases", WEAK_PHRASES), raw.get("cta_phrases", CTA_PHRASES))
+
+DEFAULT_RULES = RuleSet(WEAK_PHRASES, CTA_PHRASES)
+
+def rules_for(tenant: Optional[str]) -> RuleSet:
+    """Default rules, or the tenant's compliance.json when it has one."""
+    return tenant_config.load(tenant, "compliance", compile_rule_set) or DEFAULT_RULES
+
+def enforce_no_weak_language(text: str, rules: RuleSet = DEFAULT_RULES) -> str:
+    return rules.check(text)[0]
+
+def require_cta(text: str, rules: RuleSet = DEFAULT_RULES) -> None:
+    if not rules.check(text)[2]:
         raise ValueError("Missing CTA (call-to-action)")
 
 def validate_totals(line_items: list[dict], subtotal: float, tax: float, total: float) -> None:
-    calc = round(sum(float(i["total"]) for i in line_items), 2)
-    if round(subtotal, 2) != calc:
-        raise ValueError(f"Subtotal mismatch: expected {calc}, got {subtotal}")
-    if round(subtotal + tax, 2) != round(total, 2):
-        raise ValueError("Total mismatch: subtotal + tax != total")
+    check_totals([float(i["total"]) for i in line_items], subtotal, tax, total)
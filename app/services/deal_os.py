@@ -1,46 +1,45 @@
 from typing import Any
 from .intent import parse_intent
-from .compliance import enforce_no_weak_language, require_cta
-
-def _render_sections(sections: list[dict[str, Any]], ctx: dict[str, Any]) -> str:
-    out = []
-    for sec in sections:
-        title = (sec.get("title") or "").strip()
-        body = (sec.get("body") or "").strip()
-
-        for k, v in ctx.items():
-            if isinstance(v, (str, int, float)):
-                body = body.replace("{{" + k + "}}", str(v))
-                title = title.replace("{{" + k + "}}", str(v))
-
-        if title:
-            out.append(title)
-        if body:
-            out.append(body)
-        out.append("")
-    return "\n".join(out).strip()
-
-def generate_proposal(identity: dict[str, Any], client: dict[str, Any], proposal_ref: str, input_raw: str, templates: dict[str, Any], options: dict[str, Any]) -> dict[str, Any]:
+from .compliance import DEFAULT_RULES, RuleSet
+from .metrics import stage
+from .templating import CompiledTemplate
+
+def _flatten(obj: dict[str, Any], prefix: str = "") -> dict[str, Any]:
+    out = {}
+    for k, v in obj.items():
+        if isinstance(v, dict):
+            out.update(_flatten(v, f"{prefix}{k}."))
+        else:
+            out[f"{prefix}{k}"] = v
+    return out
+
+def generate_proposal(identity: dict[str, Any], client: dict[str, Any], proposal_ref: str, input_raw: str, templates: dict[str, CompiledTemplate], options: dict[str, Any], rules: RuleSet = DEFAULT_RULES) -> dict[str, Any]:
     structured = parse_intent(input_raw)
     structured["proposal_ref"] = proposal_ref
     structured["signals"]["assertiveness"] = (options or {}).get("assertiveness", "balanced")
 
+    # structured_context fields are addressable as {{deal.deal_type}}, {{signals.urgency}}, ...
     ctx = {
+        **_flatten(structured),
         "company_name": identity.get("company_name", ""),
         "client_name": client.get("client_name", ""),
         "proposal_ref": proposal_ref,
     }
 
-    full = _render_sections(templates["proposal_full"]["sections"], ctx)
-    execv = _render_sections(templates["proposal_exec"]["sections"], ctx)
-    email = _render_sections(templates["proposal_email"]["sections"], ctx)
-    dm = _render_sections(templates["proposal_dm"]["sections"], ctx)
+    with stage("proposal.templates"):
+        full = templates["proposal_full"].render(ctx)
+        execv = templates["proposal_exec"].render(ctx)
+        email = templates["proposal_email"].render(ctx)
+        dm = templates["proposal_dm"].render(ctx)
 
-    full = enforce_no_weak_language(full)
-    email = enforce_no_weak_language(email)
+    with stage("proposal.compliance"):
+        full, full_findings, full_cta = rules.check(full)
+        email, email_findings, email_cta = rules.check(email)
+    if not (full_cta and email_cta):
+        raise ValueError("Missing CTA (call-to-action)")
 
-    require_cta(full)
-    require_cta(email)
+    findings = [{"output": "output_full", **f.as_dict()} for f in full_findings]
+    findings += [{"output": "output_email", **f.as_dict()} for f in email_findings]
 
     return {
         "structured_context": structured,
@@ -49,4 +48,5 @@ def generate_proposal(identity: dict[str, Any], client: dict[str, Any], proposal
         "output_email": email,
         "output_dm": dm,
         "warnings": structured["signals"]["risk_flags"],
+        "compliance_findings": findings,
     }
@@ -0,0 +1,78 @@
+import datetime as dt
+from typing import Any
+
+from .metrics import stage
+from .totals import compute_totals, from_cents
+from ..schemas import BuildDocumentIn
+
+def build_document(payload: BuildDocumentIn) -> dict[str, Any]:
+    """The RenderPayload for a quote or invoice, as the plain dict that `RenderPayload.model_dump()`
+    would give, so it can go straight to the renderer. Raises ValueError without a proposal reference."""
+    proposal = payload.proposal or {}
+    client = payload.client_profile or {}
+    vf = payload.visual_financial_profile or {}
+    identity = payload.identity_profile or {}
+    overrides = payload.overrides or {}
+
+    proposal_ref = proposal.get("proposal_ref") or ""
+    if not proposal_ref:
+        raise ValueError("Proposal reference missing. Proposal linking is mandatory.")
+
+    company = {
+        "company_name": (identity.get("company_name") or "YOUR COMPANY").strip(),
+        "tagline": identity.get("tagline", ""),
+        "billing_address": vf.get("billing_address", ""),
+        "reg_number": vf.get("reg_number", ""),
+        "vat_number": vf.get("vat_number", ""),
+        "brand_accent_color": vf.get("brand_accent_color", "#0A66C2"),
+        "payment_terms_default": vf.get("payment_terms_default", "NET 7"),
+        "bank_details": vf.get("bank_details", {}) or {},
+        "email": identity.get("email", ""),
+        "website": identity.get("website", ""),
+        "signatory_name": identity.get("signatory_name", ""),
+        "signatory_role": identity.get("signatory_role", "Director"),
+    }
+
+    prefix = "INV" if payload.doc_type == "invoice" else "QUO"
+    suffix = proposal_ref.replace("SOP-", "").replace("/", "-")
+    doc_number = f"{prefix}-{suffix}"
+
+    today = dt.date.today()
+    issue_date = str(today)
+    due_date = str(today + dt.timedelta(days=7)) if payload.doc_type == "invoice" else None
+    valid_until = str(today + dt.timedelta(days=7)) if payload.doc_type == "quote" else None
+
+    items_in = overrides.get("line_items") or [{"description": "SERVICES AS PER PROPOSAL", "unit_price": 0.0, "qty": 1}]
+    units = [float(it.get("unit_price", 0.0)) for it in items_in]
+    qtys = [float(it.get("qty", 1)) for it in items_in]
+    tax_rate = float(overrides.get("tax_rate", 0.0))
+    # integer cents throughout; the result is consistent by construction, so no re-validation pass
+    with stage("build.totals"):
+        totals = compute_totals(units, qtys, tax_rate)
+    line_items = [
+        {"no": i, "description": str(it.get("description", "")), "unit_price": unit, "qty": qty, "total": from_cents(cents)}
+        for i, (it, unit, qty, cents) in enumerate(zip(items_in, units, qtys, totals.line_cents), start=1)
+    ]
+
+    notes = overrides.get("notes")
+    return {
+        "doc_type": payload.doc_type,
+        "doc_number": doc_number,
+        "issue_date": issue_date,
+        "due_date": due_date,
+        "valid_until": valid_until,
+        "proposal_ref": proposal_ref,
+        "company": company,
+        "client": {
+            "client_name": client.get("client_name", ""),
+            "client_entity": client.get("client_entity", ""),
+            "client_email": client.get("client_email", ""),
+            "client_address": client.get("client_address", ""),
+        },
+        "line_items": line_items,
+        "subtotal": totals.subtotal,
+        "tax": totals.tax,
+        "total": totals.total,
+        "notes": str(notes) if notes is not None else None,
+        "user_id": payload.user_id,
+    }
@@ -0,0 +1,183 @@
+import json
+import math
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+class QueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Render job queue is full")
+        self.retry_after = retry_after
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS render_jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    outputs TEXT NOT NULL,
+    render_id TEXT,
+    error TEXT,
+    pdf BLOB,
+    png BLOB,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    owner TEXT,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS render_jobs_status ON render_jobs (status, created_at);
+"""
+
+_STATUS_COLS = "id, status, render_id, error, outputs, created_at, started_at, finished_at"
+
+# columns added after the first release, for job files created before them
+_ADDED_COLS = {"owner": "TEXT", "lease_until": "REAL"}
+
+# a running job whose lease expired is claimable again
+_CLAIMABLE = "status = 'queued' OR (status = 'running' AND lease_until < ?)"
+
+Runner = Callable[[dict[str, Any], list[str]], tuple[str, dict[str, bytes]]]
+
+class JobQueue:
+    """Render jobs persisted in a local SQLite file and drained by a fixed number
+    of worker threads. Several processes may share the file: a job is claimed in
+    one UPDATE and leased to its claimer, which renews the lease while it runs.
+    A job whose claimer died is claimed again once its lease runs out."""
+
+    def __init__(self, path: str, concurrency: int, max_queued: int, retention_seconds: float, runner: Runner,
+                 lease_seconds: float = 60.0):
+        self.path = path
+        self.concurrency = max(1, concurrency)
+        self.max_queued = max_queued
+        self.retention_seconds = retention_seconds
+        self.runner = runner
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._tick = threading.Condition(self._lock)
+        self._stopping = False
+        self._threads: list[threading.Thread] = []
+        self._avg_seconds = 1.0
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+            have = {r["name"] for r in self._db.execute("PRAGMA table_info(render_jobs)")}
+            for col, kind in _ADDED_COLS.items():
+                if col not in have:
+                    self._db.execute(f"ALTER TABLE render_jobs ADD COLUMN {col} {kind}")
+        return self._db
+
+    def start(self) -> None:
+        with self._lock:
+            self._conn()
+            self._stopping = False
+        for i in range(self.concurrency):
+            t = threading.Thread(target=self._work, name=f"render-job-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        t = threading.Thread(target=self._renew, name="render-job-lease", daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stopping = True
+            self._wake.notify_all()
+            self._tick.notify_all()
+        for t in self._threads:
+            t.join(timeout=5)
+        self._threads = []
+        with self._lock:
+            if self._db is not None:
+                # hand back jobs a worker is still stuck in, rather than waiting out the lease
+                self._db.execute("UPDATE render_jobs SET status = 'queued', started_at = NULL, owner = NULL, lease_until = NULL "
+                                 "WHERE status = 'running' AND owner = ?", (self.owner,))
+                self._db.close()
+                self._db = None
+
+    def submit(self, payload: dict[str, Any], outputs: list[str]) -> dict[str, Any]:
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            db = self._conn()
+            db.execute("DELETE FROM render_jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (now - self.retention_seconds,))
+            (pending,) = db.execute("SELECT COUNT(*) FROM render_jobs WHERE status IN ('queued', 'running')").fetchone()
+            if pending >= self.max_queued:
+                raise QueueFull(max(1, math.ceil(self._avg_seconds * (pending - self.concurrency + 1) / self.concurrency)))
+            db.execute(
+                "INSERT INTO render_jobs (id, status, payload, outputs, created_at) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, json.dumps(payload, separators=(",", ":")), json.dumps(outputs), now),
+            )
+            self._wake.notify()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            row = self._conn().execute(f"SELECT {_STATUS_COLS} FROM render_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["job_id"] = job.pop("id")
+        job["outputs"] = json.loads(job["outputs"])
+        return job
+
+    def result(self, job_id: str) -> Optional[dict[str, bytes]]:
+        with self._lock:
+            row = self._conn().execute("SELECT pdf, png FROM render_jobs WHERE id = ? AND status = 'done'", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {k: row[k] for k in ("pdf", "png") if row[k] is not None}
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        # one statement, so two processes can never claim the same row
+        now = time.time()
+        rows = self._conn().execute(
+            "UPDATE render_jobs SET status = 'running', started_at = ?, owner = ?, lease_until = ? "
+            f"WHERE id = (SELECT id FROM render_jobs WHERE {_CLAIMABLE} ORDER BY created_at LIMIT 1) AND ({_CLAIMABLE}) "
+            "RETURNING id, payload, outputs",
+            (now, self.owner, now + self.lease_seconds, now, now),
+        ).fetchall()
+        return rows[0] if rows else None
+
+    def _renew(self) -> None:
+        """Extend the leases of this queue's running jobs while it is alive."""
+        with self._lock:
+            while not self._stopping:
+                self._tick.wait(timeout=self.lease_seconds / 3)
+                if self._db is not None and not self._stopping:
+                    self._db.execute("UPDATE render_jobs SET lease_until = ? WHERE status = 'running' AND owner = ?",
+                                     (time.time() + self.lease_seconds, self.owner))
+
+    def _work(self) -> None:
+        while True:
+            with self._lock:
+                row = None
+                while not self._stopping and (row := self._claim()) is None:
+                    self._wake.wait(timeout=5)
+                if self._stopping:
+                    if row is not None:
+                        self._conn().execute("UPDATE render_jobs SET status = 'queued', started_at = NULL, owner = NULL, lease_until = NULL "
+                                             "WHERE id = ?", (row["id"],))
+                    return
+
+            started = time.monotonic()
+            try:
+                rid, out = self.runner(json.loads(row["payload"]), json.loads(row["outputs"]))
+                update = ("UPDATE render_jobs SET status = 'done', render_id = ?, pdf = ?, png = ?, finished_at = ? "
+                          "WHERE id = ? AND owner = ?",
+                          (rid, out.get("pdf"), out.get("png"), time.time(), row["id"], self.owner))
+            except Exception as e:
+                update = ("UPDATE render_jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ? AND owner = ?",
+                          (f"{type(e).__name__}: {e}", time.time(), row["id"], self.owner))
+            with self._lock:
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.monotonic() - started)
+                if self._db is not None:
+                    self._db.execute(*update)
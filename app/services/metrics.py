@@ -0,0 +1,145 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+from ..config import settings
+
+ENABLED = settings.metrics_enabled
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+_lock = threading.Lock()
+
+class Histogram:
+    """Prometheus histogram with one label. Bucket counts are kept per bucket and
+    made cumulative only when rendered."""
+
+    def __init__(self, name: str, help: str, label: str, buckets: tuple):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        self._series: dict[str, list] = {}
+
+    def observe(self, value: str, amount: float) -> None:
+        with _lock:
+            s = self._series.get(value)
+            if s is None:
+                # [count per bucket..., +Inf count, sum]
+                s = self._series[value] = [0] * (len(self.buckets) + 1) + [0.0]
+            s[bisect_left(self.buckets, amount)] += 1
+            s[-1] += amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for value, s in sorted(series.items()):
+            lbl = f'{self.label}="{_escape(value)}"'
+            total = 0
+            for bound, n in zip(self.buckets + ("+Inf",), s[:-1]):
+                total += n
+                lines.append(f'{self.name}_bucket{{{lbl},le="{bound}"}} {total}')
+            lines.append(f"{self.name}_sum{{{lbl}}} {s[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{lbl}}} {total}")
+        return lines
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+STAGE_SECONDS = Histogram("sovereign_stage_seconds", "Time spent per hot-path stage.", "stage", SECONDS_BUCKETS)
+REQUEST_SECONDS = Histogram("sovereign_request_seconds", "Request latency until the response body is sent.", "route", SECONDS_BUCKETS)
+SIZE_BYTES = Histogram("sovereign_size_bytes", "Request body and rendered output sizes.", "kind", BYTES_BUCKETS)
+
+_in_flight = 0
+# per-request list of (stage, seconds) for the Server-Timing header
+_timings: ContextVar[Optional[list]] = ContextVar("sovereign_timings", default=None)
+
+class _Stage:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        elapsed = time.perf_counter() - self.started
+        STAGE_SECONDS.observe(self.name, elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((self.name, elapsed))
+        return False
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+_NO_STAGE = _NoStage()
+
+def stage(name: str):
+    """`with stage("render.rasterize"):` times the block. A shared no-op when metrics are off."""
+    return _Stage(name) if ENABLED else _NO_STAGE
+
+def observe_size(kind: str, n: int) -> None:
+    if ENABLED:
+        SIZE_BYTES.observe(kind, n)
+
+def server_timing(timings: list, total: float) -> str:
+    merged: dict[str, float] = {}
+    for name, seconds in timings:
+        merged[name] = merged.get(name, 0.0) + seconds
+    merged["total"] = total
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in merged.items())
+
+def render_metrics() -> str:
+    lines = [
+        "# HELP sovereign_requests_in_flight HTTP requests currently being handled.",
+        "# TYPE sovereign_requests_in_flight gauge",
+        f"sovereign_requests_in_flight {_in_flight}",
+    ]
+    for h in (REQUEST_SECONDS, STAGE_SECONDS, SIZE_BYTES):
+        lines += h.render()
+    return "\n".join(lines) + "\n"
+
+class MetricsMiddleware:
+    """ASGI middleware: in-flight count, per-route latency, request body size and a
+    Server-Timing header built from the stages the request ran before it responded."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        global _in_flight
+        started = time.perf_counter()
+        timings: list = []
+        token = _timings.set(timings)
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit():
+                SIZE_BYTES.observe("request", int(value))
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                header = server_timing(timings, time.perf_counter() - started)
+                message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        _in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _in_flight -= 1
+            _timings.reset(token)
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(getattr(route, "path", "unmatched"), time.perf_counter() - started)
@@ -0,0 +1,58 @@
+import importlib.util
+import io
+import re
+import zlib
+
+# "default": ReportLab's defaults, Flate then ASCII85 on every stream
+# "compact": the same drawing with binary Flate streams (no ASCII85 layer);
+#   forms are used exactly as in "default" (FORM_MIN_USES)
+# "linearized": compact, then rewritten by pikepdf with object streams and a
+#   linearized ("fast web view") layout, so the first page shows before the download ends
+PDF_MODES = ("default", "compact", "linearized")
+
+def can_linearize() -> bool:
+    # pikepdf is optional; only look for it, importing it costs ~100 ms
+    return importlib.util.find_spec("pikepdf") is not None
+
+def linearize(data: bytes) -> bytes:
+    import pikepdf
+    out = io.BytesIO()
+    with pikepdf.open(io.BytesIO(data)) as pdf:
+        pdf.save(
+            out,
+            linearize=True,
+            compress_streams=True,
+            object_stream_mode=pikepdf.ObjectStreamMode.generate,
+            # a content-derived /ID, so equal input still gives equal bytes
+            deterministic_id=True,
+        )
+    return out.getvalue()
+
+_STREAM = re.compile(rb">>\s*stream\r?\n")
+_LENGTH = re.compile(rb"/Length (\d+)")
+
+def pdf_stats(data: bytes) -> tuple[int, int]:
+    """(size, uncompressed size): the PDF's byte size, and what it would be with every
+    Flate stream stored raw. Only reads streams with a direct /Length; ASCII85 streams
+    (default mode) count as they are, since decoding them in Python is too slow."""
+    raw = len(data)
+    pos = 0
+    while True:
+        m = _STREAM.search(data, pos)
+        if m is None:
+            break
+        head = data[data.rfind(b" obj", 0, m.start()):m.start()]
+        length = _LENGTH.search(head)
+        if length is None:
+            pos = m.end()
+            continue
+        start, n = m.end(), int(length.group(1))
+        body = data[start:start + n]
+        pos = start + n
+        if b"/FlateDecode" not in head or b"/ASCII85Decode" in head:
+            continue
+        try:
+            raw += len(zlib.decompress(body)) - len(body)
+        except zlib.error:
+            continue
+    return len(data), raw
@@ -0,0 +1,271 @@
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, CancelledError, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+class PoolBusy(Exception):
+    pass
+
+class RenderTimeout(Exception):
+    pass
+
+# how often a queued job is checked for having started
+_QUEUE_POLL_SECONDS = 0.05
+
+# WORKER SIDE
+# shared arrays indexed by job slot: when the job started (wall clock) and in which process
+_started = None
+_pids = None
+
+def _init_worker(started, pids) -> None:
+    global _started, _pids
+    _started, _pids = started, pids
+
+def _call(slot: int, fn: Callable[..., Any], args: tuple) -> Any:
+    _pids[slot] = os.getpid()
+    _started[slot] = time.time()
+    return fn(*args)
+
+class _Job:
+    __slots__ = ("index", "fn", "args", "slot", "executor", "future", "attempt")
+
+    def __init__(self, index: int, fn: Callable[..., Any], args: tuple):
+        self.index, self.fn, self.args = index, fn, args
+        self.slot = -1
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.future: Optional[Future] = None
+        self.attempt = 0
+
+class RenderPool:
+    """Process pool for CPU-bound render jobs.
+
+    workers=0 runs jobs inline in the calling thread. Queue depth is bounded by
+    max_pending; workers are recycled after max_tasks_per_child jobs. The timeout
+    counts from when a worker starts the job, not from submission. A timed-out
+    job's worker is killed, which breaks the pool: it is replaced, and the other
+    jobs it held are re-submitted once, as are jobs caught by a crashed worker."""
+
+    def __init__(self, workers: int, max_pending: int, timeout: float, max_tasks_per_child: int):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_tasks_per_child = max_tasks_per_child
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # queue slots plus one per worker for warm(); every job holds one while submitted
+        self._job_slot_count = max(1, max_pending) + max(0, workers)
+        self._job_slots = list(range(self._job_slot_count))
+        self._started = None
+        self._pids = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # max_tasks_per_child is not supported with fork
+                ctx = multiprocessing.get_context("spawn")
+                if self._started is None:
+                    self._started = ctx.RawArray("d", self._job_slot_count)
+                    self._pids = ctx.RawArray("i", self._job_slot_count)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=ctx,
+                    max_tasks_per_child=self.max_tasks_per_child or None,
+                    initializer=_init_worker,
+                    initargs=(self._started, self._pids),
+                )
+            return self._executor
+
+    def _recycle(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def _submit(self, job: _Job) -> None:
+        with self._lock:
+            job.slot = self._job_slots.pop()
+        executor = self._get_executor()
+        self._started[job.slot] = 0.0
+        try:
+            future = executor.submit(_call, job.slot, job.fn, job.args)
+        except (BrokenProcessPool, RuntimeError):
+            self._recycle(executor)
+            executor = self._get_executor()
+            future = executor.submit(_call, job.slot, job.fn, job.args)
+        job.executor, job.future = executor, future
+
+    def _release(self, job: _Job) -> None:
+        with self._lock:
+            self._job_slots.append(job.slot)
+        job.slot = -1
+
+    def _deadline(self, job: _Job) -> Optional[float]:
+        """Wall-clock deadline, or None while the job is still queued."""
+        started = self._started[job.slot]
+        return started + self.timeout if started else None
+
+    def _kill(self, job: _Job) -> None:
+        # only the stuck worker, by the pid it recorded when it took the job; its death
+        # breaks the executor, which fails the other jobs it held with BrokenProcessPool
+        # so their callers re-submit them
+        pid = self._pids[job.slot]
+        if pid and not job.future.done():
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        self._recycle(job.executor)
+
+    def _retry(self, job: _Job, error: BaseException) -> bool:
+        """After the job's pool broke under it: re-submit once and return True, or
+        return False when it was already re-submitted."""
+        self._recycle(job.executor)
+        self._release(job)
+        if job.attempt:
+            return False
+        job.attempt += 1
+        self._submit(job)
+        return True
+
+    def _result(self, job: _Job) -> Any:
+        """job.future.result(), with RenderTimeout once the job has run for self.timeout."""
+        while True:
+            deadline = self._deadline(job)
+            try:
+                return job.future.result(timeout=_QUEUE_POLL_SECONDS if deadline is None else max(0.0, deadline - time.time()))
+            except TimeoutError:
+                if deadline is not None and time.time() >= deadline:
+                    self._kill(job)
+                    raise RenderTimeout(f"Render exceeded {self.timeout:g}s")
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.workers <= 0:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PoolBusy("Render queue is full")
+        job = _Job(0, fn, args)
+        try:
+            self._submit(job)
+            while True:
+                try:
+                    return self._result(job)
+                except (BrokenProcessPool, CancelledError) as e:
+                    # another job's timeout or crash took the pool down with this one in it
+                    if not self._retry(job, e):
+                        if isinstance(e, CancelledError):
+                            raise PoolBusy("Render was cancelled by a pool restart") from e
+                        raise
+        finally:
+            if job.slot >= 0:
+                self._release(job)
+            self._slots.release()
+
+    def imap(self, fn: Callable[..., Any], jobs: Iterable[tuple], ordered: bool = True) -> Iterator[tuple[int, Any, Optional[BaseException]]]:
+        """Yield (index, result, error) per job, in input order or as jobs finish.
+
+        At most `workers` jobs are in flight for this call, and each holds a
+        shared queue slot (waiting for one rather than failing)."""
+        if self.workers <= 0:
+            for i, args in enumerate(jobs):
+                try:
+                    yield i, fn(*args), None
+                except Exception as e:
+                    yield i, None, e
+            return
+
+        it = enumerate(jobs)
+        pending: dict[Future, _Job] = {}
+        done_buf: dict[int, tuple[Any, Optional[BaseException]]] = {}
+        next_out = 0
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < self.workers:
+                    nxt = next(it, None)
+                    if nxt is None:
+                        exhausted = True
+                        break
+                    job = _Job(nxt[0], fn, nxt[1])
+                    self._slots.acquire()
+                    try:
+                        self._submit(job)
+                    except BaseException:
+                        if job.slot >= 0:
+                            self._release(job)
+                        self._slots.release()
+                        raise
+                    pending[job.future] = job
+
+                if not pending:
+                    break
+
+                deadlines = [self._deadline(job) for job in pending.values()]
+                now = time.time()
+                timeout = min([d - now for d in deadlines if d is not None] + ([_QUEUE_POLL_SECONDS] if None in deadlines else []))
+                finished, _ = wait(pending, timeout=max(0.0, timeout), return_when=FIRST_COMPLETED)
+                now = time.time()
+                results: list[tuple[int, Any, Optional[BaseException]]] = []
+                for fut, job in list(pending.items()):
+                    deadline = self._deadline(job)
+                    if fut in finished:
+                        del pending[fut]
+                        try:
+                            results.append((job.index, fut.result(), None))
+                        except (BrokenProcessPool, CancelledError) as e:
+                            # caught in a pool that another job's timeout or crash took down
+                            if self._retry(job, e):
+                                pending[job.future] = job
+                                continue
+                            results.append((job.index, None, e if isinstance(e, BrokenProcessPool) else PoolBusy("Render was cancelled by a pool restart")))
+                            self._slots.release()
+                            continue
+                        except Exception as e:
+                            results.append((job.index, None, e))
+                    elif deadline is not None and deadline <= now:
+                        del pending[fut]
+                        self._kill(job)
+                        results.append((job.index, None, RenderTimeout(f"Render exceeded {self.timeout:g}s")))
+                    else:
+                        continue
+                    self._release(job)
+                    self._slots.release()
+
+                for i, res, err in sorted(results, key=lambda r: r[0]):
+                    if not ordered:
+                        yield i, res, err
+                        continue
+                    done_buf[i] = (res, err)
+                while ordered and next_out in done_buf:
+                    res, err = done_buf.pop(next_out)
+                    yield next_out, res, err
+                    next_out += 1
+        finally:
+            for fut, job in pending.items():
+                fut.cancel()
+                self._release(job)
+                self._slots.release()
+
+    def warm(self, fn: Callable[..., Any], *args: Any) -> None:
+        """Run fn once per worker at the same time, so every worker process is
+        spawned and has its imports loaded before real traffic arrives."""
+        if self.workers <= 0:
+            return
+        jobs = [_Job(i, fn, args) for i in range(self.workers)]
+        for job in jobs:
+            self._submit(job)
+        try:
+            for job in jobs:
+                job.future.result(timeout=self.timeout)
+        finally:
+            for job in jobs:
+                self._release(job)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
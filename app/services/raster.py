@@ -0,0 +1,122 @@
+import io
+import os
+import struct
+from functools import lru_cache
+import reportlab
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+from ..config import settings
+from .cache import ByteCache
+from .raster_profiles import RasterProfile
+
+# ReportLab ships Type 1 fonts metric-compatible with the PDF base-14 Helvetica faces,
+# so raster text lines up with the PDF without a system font package.
+_RL_FONTS = os.path.join(os.path.dirname(reportlab.__file__), "fonts")
+FONT_FILES = {
+    "Helvetica": "_a______.pfb",
+    "Helvetica-Bold": "_ab_____.pfb",
+}
+
+@lru_cache(maxsize=64)
+def _font(name: str, px: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(os.path.join(_RL_FONTS, FONT_FILES[name]), max(1, px))
+
+# pre-rendered layer bitmaps (raw RGB), keyed by layer and image size
+_layer_bitmaps = ByteCache(settings.branding_cache_max_bytes)
+
+def _rgb(color) -> tuple[int, int, int]:
+    r, g, b = color.rgb()
+    return round(r * 255), round(g * 255), round(b * 255)
+
+class RasterCanvas:
+    """Pillow backend for the subset of the ReportLab canvas API used by render.layout.
+    Coordinates are PDF points with a bottom-left origin."""
+
+    def __init__(self, page_w: float, page_h: float, dpi: float):
+        self.scale = dpi / 72.0
+        self.page_h = page_h
+        self.image = Image.new("RGB", (round(page_w * self.scale), round(page_h * self.scale)), "white")
+        self._draw = ImageDraw.Draw(self.image)
+        self._font = _font("Helvetica", round(12 * self.scale))
+        self._fill = (0, 0, 0)
+        self._stroke = (0, 0, 0)
+
+    def _xy(self, x: float, y: float) -> tuple[float, float]:
+        return x * self.scale, (self.page_h - y) * self.scale
+
+    def setFont(self, name: str, size: float) -> None:
+        self._font = _font(name, round(size * self.scale))
+
+    def setFillColor(self, color) -> None:
+        self._fill = _rgb(color)
+
+    def setStrokeColor(self, color) -> None:
+        self._stroke = _rgb(color)
+
+    def _text(self, x: float, y: float, text: str, anchor: str) -> None:
+        if text:
+            self._draw.text(self._xy(x, y), str(text), fill=self._fill, font=self._font, anchor=anchor)
+
+    def drawString(self, x: float, y: float, text: str) -> None:
+        self._text(x, y, text, "ls")
+
+    def drawRightString(self, x: float, y: float, text: str) -> None:
+        self._text(x, y, text, "rs")
+
+    def drawCentredString(self, x: float, y: float, text: str) -> None:
+        self._text(x, y, text, "ms")
+
+    def drawLayer(self, layer, uses: int = 1) -> None:
+        w, h = self.image.size
+        raw = _layer_bitmaps.get_or_create(f"{layer.key}.{w}x{h}", lambda: self._layer_bitmap(layer))
+        # layers come first on a page and do not overlap, so pasting their inked
+        # regions over the blank canvas is the same as drawing them underneath
+        view = memoryview(raw)
+        off = 0
+        while off < len(raw):
+            x0, y0, x1, y1 = struct.unpack_from("<4I", raw, off)
+            off += 16
+            n = (x1 - x0) * (y1 - y0) * 3
+            self.image.paste(Image.frombuffer("RGB", (x1 - x0, y1 - y0), view[off:off + n], "raw", "RGB", 0, 1), (x0, y0))
+            off += n
+
+    def _layer_bitmap(self, layer) -> bytes:
+        """The layer drawn alone, cut into the horizontal bands it inks (so a header and
+        a footer are kept without the blank page between them). Per band: a 16-byte
+        box, then raw RGB."""
+        rc = RasterCanvas(self.image.width / self.scale, self.page_h, self.scale * 72.0)
+        layer.ops.replay(rc)
+        ink = ImageChops.invert(rc.image)
+        out = []
+        for top, bottom in _bands(ink.getprojection()[1], gap=round(12 * self.scale)):
+            x0, _, x1, _ = ink.crop((0, top, ink.width, bottom)).getbbox()
+            box = (x0, top, x1, bottom)
+            out += [struct.pack("<4I", *box), rc.image.crop(box).tobytes()]
+        return b"".join(out)
+
+    def rect(self, x: float, y: float, width: float, height: float, stroke: int = 1, fill: int = 0) -> None:
+        x1, y1 = self._xy(x, y + height)
+        x2, y2 = self._xy(x + width, y)
+        box = (round(x1), round(y1), round(x2), round(y2))
+        if fill:
+            self._draw.rectangle(box, fill=self._fill)
+        if stroke:
+            self._draw.rectangle(box, outline=self._stroke, width=max(1, round(self.scale)))
+
+def _bands(inked_rows: bytes, gap: int) -> list[tuple[int, int]]:
+    """[top, bottom) row ranges with ink; runs closer than `gap` rows are merged."""
+    bands: list[list[int]] = []
+    for y, inked in enumerate(inked_rows):
+        if not inked:
+            continue
+        if bands and y - bands[-1][1] <= gap:
+            bands[-1][1] = y + 1
+        else:
+            bands.append([y, y + 1])
+    return [(top, bottom) for top, bottom in bands]
+
+def encode(image: Image.Image, profile: RasterProfile) -> bytes:
+    if profile.colors:
+        image = image.quantize(profile.colors, method=Image.Quantize.FASTOCTREE)
+    out = io.BytesIO()
+    image.save(out, format=profile.format, **profile.save_options)
+    return out.getvalue()
@@ -0,0 +1,34 @@
+from dataclasses import dataclass, field
+from typing import Any
+
+_EXTENSIONS = {"PNG": "png", "WEBP": "webp", "JPEG": "jpg"}
+
+@dataclass(frozen=True)
+class RasterProfile:
+    """How a page preview is rasterized and encoded. The page is drawn directly at
+    the resolution that fits it inside `box`, so the aspect ratio is preserved and
+    no full-size intermediate image is resized."""
+    name: str
+    box: tuple[int, int]
+    format: str
+    media_type: str
+    # > 0: quantize to a palette of this many colors before encoding
+    colors: int = 0
+    save_options: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def extension(self) -> str:
+        return _EXTENSIONS[self.format]
+
+    def dpi(self, page_w: float, page_h: float) -> float:
+        return 72.0 * min(self.box[0] / page_w, self.box[1] / page_h)
+
+PROFILES = {
+    # fits a 3840x2160 screen; documents are flat colour, so a palette loses nothing visible
+    "4k": RasterProfile("4k", (3840, 2160), "PNG", "image/png", colors=256, save_options={"compress_level": 6}),
+    "hd": RasterProfile("hd", (1920, 1080), "WEBP", "image/webp", save_options={"lossless": True, "method": 4}),
+    "thumb": RasterProfile("thumb", (400, 400), "PNG", "image/png", colors=64, save_options={"compress_level": 6}),
+}
+
+# the profile behind the `png` render output
+DEFAULT_PROFILE = "4k"
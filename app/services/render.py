@@ -1,11 +1,19 @@
 import io
-import base64
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
+from itertools import chain, islice
+from typing import Iterable, Iterator
+from reportlab import rl_config
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 from reportlab.lib import colors
-from pdf2image import convert_from_bytes
+from .cache import canonical_hash
+from .metrics import stage
+from .pdf_tools import linearize
+from .raster import RasterCanvas, encode
+from .raster_profiles import DEFAULT_PROFILE, PROFILES, RasterProfile
 
 @dataclass(frozen=True)
 class Layout:
@@ -15,14 +23,22 @@ class Layout:
     header_h: float
     table_top: float
     row_h: float
+    cont_table_top: float
+    rows_floor: float
+    totals_floor: float
 
 LAYOUT = Layout(
     page_w=A4[0],
     page_h=A4[1],
     margin=18*mm,
-    header_h=55*mm,
-    table_top=A4[1] - (18*mm) - (55*mm) - (10*mm),
+    header_h=30*mm,
+    table_top=A4[1] - (18*mm) - (30*mm) - (35*mm),
     row_h=9*mm,
+    # continuation pages have no BILL TO block, so the table starts right under the header
+    cont_table_top=A4[1] - (18*mm) - (30*mm) - (9*mm),
+    # lowest row bottom: above the footer on every page, above notes + totals + payment on the last
+    rows_floor=(18*mm) + 52,
+    totals_floor=(18*mm) + 157 + 62,
 )
 
 COLS = ["NO", "DESCRIPTION", "PRICE", "QTY", "TOTAL"]
@@ -37,19 +53,89 @@ def _hex_to_color(hex_str: str):
     b = int(h[4:6], 16)/255.0
     return colors.Color(r, g, b)
 
-def render_invoice_quote(payload: dict) -> tuple[bytes, bytes]:
-    company = payload["company"]
-    client = payload["client"]
-    accent = _hex_to_color(company.get("brand_accent_color", "#0A66C2"))
+_DRAW_OPS = ("setFont", "setFillColor", "setStrokeColor", "drawString", "drawRightString", "drawCentredString", "rect", "drawLayer")
 
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    c.setTitle(f"{payload['doc_type'].upper()} {payload['doc_number']}")
+class DisplayList:
+    """Records the canvas calls of one page so the PDF and raster backends replay the same layout."""
 
-    w, h = LAYOUT.page_w, LAYOUT.page_h
+    def __init__(self):
+        self.ops: list[tuple[str, tuple, dict]] = []
+
+    def replay(self, target) -> None:
+        for name, args, kwargs in self.ops:
+            getattr(target, name)(*args, **kwargs)
+
+def _recorder(name: str):
+    def record(self, *args, **kwargs):
+        self.ops.append((name, args, kwargs))
+    return record
+
+for _name in _DRAW_OPS:
+    setattr(DisplayList, _name, _recorder(_name))
+
+@dataclass(frozen=True, eq=False)
+class Layer:
+    """Static drawing shared by many pages, e.g. a company's branding. Backends draw
+    it once and reuse the result: a form XObject in the PDF, a cached bitmap in the
+    raster. It must be drawn before anything else on a page, must not overlap other
+    layers, and does not change the drawing state. drawLayer(layer, uses) also says
+    how many pages of the document draw it."""
+    key: str
+    ops: DisplayList
+
+# a form XObject costs about as much as three or four inline copies of a small layer
+FORM_MIN_USES = 4
+
+class _PdfCanvas(canvas.Canvas):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._layer_forms: dict[str, str] = {}
+
+    def drawLayer(self, layer: Layer, uses: int = 1) -> None:
+        if uses < FORM_MIN_USES:
+            self.saveState()
+            layer.ops.replay(self)
+            self.restoreState()
+            return
+        name = self._layer_forms.get(layer.key)
+        if name is None:
+            name = self._layer_forms[layer.key] = f"layer{len(self._layer_forms)}"
+            self.beginForm(name)
+            layer.ops.replay(self)
+            self.endForm()
+        self.doForm(name)
+
+def _rows_fit(top: float, floor: float) -> int:
+    return int((top - floor) // LAYOUT.row_h)
+
+def page_plan(n_items: int) -> list[int]:
+    """Line items per page. Continuation pages spend a row on BROUGHT FORWARD and
+    every page but the last spends one on CARRIED FORWARD; totals go on the last page."""
+    first_last = _rows_fit(LAYOUT.table_top, LAYOUT.totals_floor)
+    if n_items <= first_last:
+        return [n_items]
+    first = _rows_fit(LAYOUT.table_top, LAYOUT.rows_floor) - 1
+    cont_last = _rows_fit(LAYOUT.cont_table_top, LAYOUT.totals_floor) - 1
+    cont = _rows_fit(LAYOUT.cont_table_top, LAYOUT.rows_floor) - 2
+    plan = [min(n_items, first)]
+    left = n_items - plan[0]
+    while left > cont_last:
+        # too many for a totals page; a continuation page takes what it can
+        take = min(cont, left)
+        plan.append(take)
+        left -= take
+    plan.append(left)
+    if left == 0:
+        # keep at least one line item next to the totals
+        plan[-2] -= 1
+        plan[-1] = 1
+    return plan
+
+def _header_left(c, company: dict) -> None:
+    h = LAYOUT.page_h
     x0, y0 = LAYOUT.margin, LAYOUT.margin
 
-    # HEADER LEFT
+    c.setFillColor(colors.black)
     c.setFont("Helvetica-Bold", 14)
     c.drawString(x0, h - y0 - 10, (company.get("company_name") or "").upper())
 
@@ -66,8 +152,12 @@ def render_invoice_quote(payload: dict) -> tuple[bytes, bytes]:
     if reg:
         c.drawString(x0, h - y0 - 48, f"REG: {reg}")
 
-    # HEADER RIGHT
+def _header_right(c, payload: dict, page_no: int, page_count: int) -> None:
+    w, h = LAYOUT.page_w, LAYOUT.page_h
+    y0 = LAYOUT.margin
+
     right_x = w - y0 - 170
+    c.setFillColor(colors.black)
     c.setFont("Helvetica-Bold", 22)
     c.drawString(right_x, h - y0 - 18, payload["doc_type"].upper())
 
@@ -79,8 +169,13 @@ def render_invoice_quote(payload: dict) -> tuple[bytes, bytes]:
         c.drawString(right_x, meta_y - 24, f"DUE: {payload['due_date']}")
     if payload.get("valid_until"):
         c.drawString(right_x, meta_y - 24, f"VALID UNTIL: {payload['valid_until']}")
+    if page_count > 1:
+        c.drawString(right_x, meta_y - 36, f"PAGE {page_no} OF {page_count}")
+
+def _bill_to(c, payload: dict, client: dict) -> None:
+    w, h = LAYOUT.page_w, LAYOUT.page_h
+    x0, y0 = LAYOUT.margin, LAYOUT.margin
 
-    # BILL TO
     bill_y = h - y0 - LAYOUT.header_h
     c.setFont("Helvetica-Bold", 10)
     c.drawString(x0, bill_y, "BILL TO")
@@ -93,8 +188,8 @@ def render_invoice_quote(payload: dict) -> tuple[bytes, bytes]:
     c.setFont("Helvetica", 8)
     c.drawRightString(w - y0, bill_y - 14, f"PROPOSAL REF: {payload['proposal_ref']}")
 
-    # TABLE HEADER
-    table_y = LAYOUT.table_top
+def _table_header(c, accent, table_y: float) -> None:
+    x0 = LAYOUT.margin
     c.setFillColor(accent)
     c.rect(x0, table_y, sum(COL_WIDTHS), LAYOUT.row_h, stroke=0, fill=1)
 
@@ -105,23 +200,27 @@ def render_invoice_quote(payload: dict) -> tuple[bytes, bytes]:
         c.drawString(cx + 4, table_y + 3, col)
         cx += COL_WIDTHS[i]
 
-    # TABLE ROWS
+def _row(c, y: float, no: str, description: str, price: str, qty: str, total: str) -> None:
+    x0 = LAYOUT.margin
+    cx = x0
+    c.setStrokeColor(colors.lightgrey)
+    c.rect(x0, y, sum(COL_WIDTHS), LAYOUT.row_h, stroke=1, fill=0)
+
     c.setFillColor(colors.black)
-    c.setFont("Helvetica", 9)
-    y = table_y - LAYOUT.row_h
-    for item in payload["line_items"]:
-        cx = x0
-        c.setStrokeColor(colors.lightgrey)
-        c.rect(x0, y, sum(COL_WIDTHS), LAYOUT.row_h, stroke=1, fill=0)
+    c.drawString(cx + 4, y + 3, no); cx += COL_WIDTHS[0]
+    c.drawString(cx + 4, y + 3, description); cx += COL_WIDTHS[1]
+    c.drawRightString(cx + COL_WIDTHS[2] - 4, y + 3, price); cx += COL_WIDTHS[2]
+    c.drawRightString(cx + COL_WIDTHS[3] - 4, y + 3, qty); cx += COL_WIDTHS[3]
+    c.drawRightString(cx + COL_WIDTHS[4] - 4, y + 3, total)
 
-        c.setFillColor(colors.black)
-        c.drawString(cx + 4, y + 3, str(item["no"])); cx += COL_WIDTHS[0]
-        c.drawString(cx + 4, y + 3, str(item["description"])[:70]); cx += COL_WIDTHS[1]
-        c.drawRightString(cx + COL_WIDTHS[2] - 4, y + 3, f"{float(item['unit_price']):.2f}"); cx += COL_WIDTHS[2]
-        c.drawRightString(cx + COL_WIDTHS[3] - 4, y + 3, f"{float(item['qty']):.0f}"); cx += COL_WIDTHS[3]
-        c.drawRightString(cx + COL_WIDTHS[4] - 4, y + 3, f"{float(item['total']):.2f}")
+def _forward_row(c, y: float, label: str, amount: float) -> None:
+    c.setFont("Helvetica-Bold", 9)
+    _row(c, y, "", label, "", "", f"{amount:.2f}")
+    c.setFont("Helvetica", 9)
 
-        y -= LAYOUT.row_h
+def _totals(c, payload: dict, accent, y: float) -> None:
+    w = LAYOUT.page_w
+    x0, y0 = LAYOUT.margin, LAYOUT.margin
 
     # NOTES
     if payload.get("notes"):
@@ -147,6 +246,9 @@ def render_invoice_quote(payload: dict) -> tuple[bytes, bytes]:
     c.drawString(totals_x + 6, totals_y - 31, "TOTAL DUE" if payload["doc_type"] == "invoice" else "TOTAL")
     c.drawRightString(w - y0 - 6, totals_y - 31, f"{float(payload['total']):.2f}")
 
+def _payment(c, company: dict) -> None:
+    x0, y0 = LAYOUT.margin, LAYOUT.margin
+
     # PAYMENT METHOD
     pay_y = y0 + 90
     bank = company.get("bank_details", {}) or {}
@@ -165,7 +267,11 @@ def render_invoice_quote(payload: dict) -> tuple[bytes, bytes]:
     c.setFont("Helvetica", 8)
     c.drawString(x0, pay_y - 12, f"TERMS: {terms}. Payment is due per the dates above.")
 
-    # FOOTER
+def _footer(c, company: dict) -> None:
+    w = LAYOUT.page_w
+    y0 = LAYOUT.margin
+
+    c.setFillColor(colors.black)
     c.setFont("Helvetica-Bold", 10)
     c.drawCentredString(w/2, y0 + 30, "THANK YOU FOR YOUR BUSINESS")
     c.setFont("Helvetica", 9)
@@ -177,17 +283,142 @@ def render_invoice_quote(payload: dict) -> tuple[bytes, bytes]:
     if footer:
         c.drawCentredString(w/2, y0 + 16, footer)
 
-    c.showPage()
-    c.save()
-    pdf_bytes = buffer.getvalue()
+# BRANDING LAYERS
+LAYER_CACHE_ENTRIES = 512
+
+_layers: OrderedDict[str, Layer] = OrderedDict()
+_layers_lock = threading.Lock()
+
+def _layer(key: str, draw, *args) -> Layer:
+    """The Layer drawn by draw(ops, *args), built once per key. Keys name everything
+    the drawing depends on; the LRU is shared across tenants."""
+    with _layers_lock:
+        layer = _layers.get(key)
+        if layer is not None:
+            _layers.move_to_end(key)
+            return layer
+    ops = DisplayList()
+    draw(ops, *args)
+    layer = Layer(key, ops)
+    with _layers_lock:
+        _layers[key] = layer
+        if len(_layers) > LAYER_CACHE_ENTRIES:
+            _layers.popitem(last=False)
+    return layer
+
+def _frame(c, company: dict) -> None:
+    _header_left(c, company)
+    _footer(c, company)
+
+def pages(payload: dict) -> Iterator[DisplayList]:
+    """Lay the document out one page at a time. Only the current page is held,
+    so memory stays flat however many line items there are."""
+    company = payload["company"]
+    client = payload["client"]
+    accent = _hex_to_color(company.get("brand_accent_color", "#0A66C2"))
+    # the static parts of each page: everything they draw comes from the company profile
+    brand = canonical_hash(company)
+    frame = _layer(f"{brand}.frame", _frame, company)
+
+    plan = page_plan(len(payload["line_items"]))
+    items = iter(payload["line_items"])
+    carried = 0.0
+    for page_no, count in enumerate(plan, start=1):
+        c = DisplayList()
+        table_y = LAYOUT.table_top if page_no == 1 else LAYOUT.cont_table_top
+        c.drawLayer(frame, len(plan))
+        c.drawLayer(_layer(f"{brand}.table.{page_no == 1:d}", _table_header, accent, table_y), 1 if page_no == 1 else len(plan) - 1)
+        if page_no == len(plan):
+            c.drawLayer(_layer(f"{brand}.payment", _payment, company))
+        _header_right(c, payload, page_no, len(plan))
+        if page_no == 1:
+            _bill_to(c, payload, client)
+
+        # TABLE
+        c.setFont("Helvetica", 9)
+        y = table_y - LAYOUT.row_h
+        if page_no > 1:
+            _forward_row(c, y, "BROUGHT FORWARD", carried)
+            y -= LAYOUT.row_h
+        for item in islice(items, count):
+            _row(
+                c, y,
+                str(item["no"]),
+                str(item["description"])[:70],
+                f"{float(item['unit_price']):.2f}",
+                f"{float(item['qty']):.0f}",
+                f"{float(item['total']):.2f}",
+            )
+            carried += float(item["total"])
+            y -= LAYOUT.row_h
+
+        if page_no < len(plan):
+            _forward_row(c, y, "CARRIED FORWARD", carried)
+        else:
+            _totals(c, payload, accent, y)
+        yield c
 
-    images = convert_from_bytes(pdf_bytes, dpi=300)
-    img = images[0].resize((3840, 2160))
-    out_png = io.BytesIO()
-    img.save(out_png, format="PNG")
-    png_bytes = out_png.getvalue()
+def _draw_pdf(page_iter: Iterable[DisplayList], payload: dict, mode: str = "default") -> bytes:
+    with stage("render.pdf_draw"):
+        data = _pdf_bytes(page_iter, payload, mode)
+    if mode == "linearized":
+        with stage("render.linearize"):
+            data = linearize(data)
+    return data
 
-    return pdf_bytes, png_bytes
+# rl_config is process-wide and read while saving, so saves take turns: a compact
+# save never changes the stream filters of a concurrent default one
+_SAVE_LOCK = threading.Lock()
+
+def _pdf_bytes(page_iter: Iterable[DisplayList], payload: dict, mode: str = "default") -> bytes:
+    compact = mode != "default"
+    buffer = io.BytesIO()
+    # invariant: no creation timestamp or random document ID, so equal payloads give equal bytes
+    c = _PdfCanvas(buffer, pagesize=A4, invariant=1)
+    c.setTitle(f"{payload['doc_type'].upper()} {payload['doc_number']}")
+    for dl in page_iter:
+        dl.replay(c)
+        c.showPage()
+    with _SAVE_LOCK:
+        use_a85 = rl_config.useA85
+        # compact: binary Flate streams, without the ASCII85 layer that adds 25%
+        rl_config.useA85 = 0 if compact else use_a85
+        try:
+            c.save()
+        finally:
+            rl_config.useA85 = use_a85
+    return buffer.getvalue()
 
-def b64(bytes_in: bytes) -> str:
-    return base64.b64encode(bytes_in).decode("utf-8")
+def _draw_image(dl: DisplayList, profile: RasterProfile) -> bytes:
+    with stage("render.rasterize"):
+        rc = RasterCanvas(LAYOUT.page_w, LAYOUT.page_h, dpi=profile.dpi(LAYOUT.page_w, LAYOUT.page_h))
+        dl.replay(rc)
+    with stage("render.encode"):
+        return encode(rc.image, profile)
+
+def render_pdf(payload: dict, mode: str = "default") -> bytes:
+    return _draw_pdf(pages(payload), payload, mode)
+
+def render_image(payload: dict, profile: str = DEFAULT_PROFILE) -> bytes:
+    # images are previews of the first page
+    with stage("render.layout"):
+        first = next(pages(payload))
+    return _draw_image(first, PROFILES[profile])
+
+def render_png(payload: dict) -> bytes:
+    return render_image(payload, DEFAULT_PROFILE)
+
+def render_outputs(payload: dict, outputs: list[str]) -> dict[str, bytes]:
+    page_iter = pages(payload)
+    with stage("render.layout"):
+        first = next(page_iter)
+    out = {}
+    if "pdf" in outputs:
+        out["pdf"] = _draw_pdf(chain([first], page_iter), payload)
+    if "png" in outputs:
+        out["png"] = _draw_image(first, PROFILES[DEFAULT_PROFILE])
+    return out
+
+def render_invoice_quote(payload: dict) -> tuple[bytes, bytes]:
+    out = render_outputs(payload, ["pdf", "png"])
+    return out["pdf"], out["png"]
@@ -0,0 +1,183 @@
+import json
+import logging
+import re
+import sqlite3
+from typing import Any, Iterator, Optional
+from ..config import settings
+from .archive import DocumentArchive
+from .cache import ByteCache, canonical_hash
+from .jobs import JobQueue
+from .metrics import observe_size, stage
+from .pool import RenderPool
+from .raster_profiles import DEFAULT_PROFILE
+
+def _render():
+    # ReportLab, Pillow and NumPy are imported here on first use (or by warm_up)
+    # rather than at app import, so the server starts listening sooner.
+    from . import render
+    return render
+
+# Bump whenever drawing output changes, so stale cache entries and ETags are not reused.
+RENDER_VERSION = "5"
+
+cache = ByteCache(
+    settings.render_cache_max_bytes,
+    settings.render_cache_dir,
+    disk_max_bytes=settings.render_cache_disk_max_bytes,
+    disk_ttl_seconds=settings.render_cache_disk_ttl_seconds,
+)
+archive = DocumentArchive(settings.archive_dir) if settings.archive_dir else None
+pool = RenderPool(settings.render_workers, settings.render_queue_depth, settings.render_timeout_seconds, settings.render_worker_max_tasks)
+
+_RENDER_ID = re.compile(r"^[0-9a-f]{64}$")
+
+def render_id(payload: dict[str, Any]) -> str:
+    return canonical_hash(payload, RENDER_VERSION)
+
+def retain(payload: dict[str, Any], rid: str) -> None:
+    key = f"{rid}.json"
+    if cache.get(key) is None:
+        cache.put(key, json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+def load_payload(rid: str) -> Optional[dict[str, Any]]:
+    if not _RENDER_ID.match(rid):
+        return None
+    raw = cache.get(f"{rid}.json")
+    return json.loads(raw) if raw is not None else None
+
+log = logging.getLogger(__name__)
+
+def _archived(payload: dict[str, Any], rid: str, kind: str, data: bytes, hit: bool = False) -> bytes:
+    """Write a render to the archive. A cache hit is written only when the archive
+    lacks the document or holds another render of it (the archive was cleared, or
+    the document was re-rendered with different content since). A failed write is
+    logged, not raised: the render itself succeeded."""
+    if archive is not None:
+        try:
+            if hit:
+                row = archive.get(payload.get("user_id") or "", payload["doc_number"], kind)
+                if row is not None and row["render_id"] == rid:
+                    return data
+            archive.store(payload, rid, kind, data)
+        except (OSError, sqlite3.Error):
+            log.exception("Could not archive %s.%s", payload.get("doc_number"), kind)
+    return data
+
+def get_pdf(payload: dict[str, Any], rid: str, mode: str = "default") -> bytes:
+    # the default mode is the `pdf` output; other modes are cached beside it
+    kind = "pdf" if mode == "default" else f"pdf-{mode}"
+
+    drawn = False
+
+    def draw() -> bytes:
+        nonlocal drawn
+        drawn = True
+        data = pool.run(_render().render_pdf, payload, mode)
+        # the archive keeps the default encoding, so a document number always maps to one file
+        return _archived(payload, rid, kind, data) if kind == "pdf" else data
+
+    with stage(f"render.{kind}"):
+        data = cache.get_or_create(f"{rid}.{kind}", draw)
+    if not drawn and kind == "pdf":
+        _archived(payload, rid, kind, data, hit=True)
+    observe_size(kind, len(data))
+    return data
+
+def get_image(payload: dict[str, Any], rid: str, profile: str = DEFAULT_PROFILE) -> bytes:
+    # the default profile is the `png` output, so it shares that cache entry
+    kind = "png" if profile == DEFAULT_PROFILE else profile
+
+    drawn = False
+
+    def draw() -> bytes:
+        nonlocal drawn
+        drawn = True
+        data = pool.run(_render().render_image, payload, profile)
+        # only the `png` output is a document; other profiles are previews
+        return _archived(payload, rid, kind, data) if kind == "png" else data
+
+    with stage(f"render.{kind}"):
+        data = cache.get_or_create(f"{rid}.{kind}", draw)
+    if not drawn and kind == "png":
+        _archived(payload, rid, kind, data, hit=True)
+    observe_size(kind, len(data))
+    return data
+
+def render_many(payloads: list[dict[str, Any]], outputs: list[str], ordered: bool = True) -> Iterator[tuple[int, str, Optional[dict[str, bytes]], Optional[BaseException]]]:
+    """Yield (index, render_id, outputs, error) per payload. Cache hits are served
+    directly; misses are spread across the process pool."""
+    rids = [render_id(p) for p in payloads]
+    cached: dict[int, dict[str, bytes]] = {}
+    misses: list[int] = []
+    for i, rid in enumerate(rids):
+        found = {k: cache.get(f"{rid}.{k}") for k in outputs}
+        if all(v is not None for v in found.values()):
+            cached[i] = found
+        else:
+            misses.append(i)
+
+    for i, rid in enumerate(rids):
+        retain(payloads[i], rid)
+    for i, found in cached.items():
+        for k, v in found.items():
+            _archived(payloads[i], rids[i], k, v, hit=True)
+
+    def finish(j: int, result: Optional[dict[str, bytes]], error: Optional[BaseException]):
+        i = misses[j]
+        if result is not None:
+            for k, v in result.items():
+                cache.put(f"{rids[i]}.{k}", _archived(payloads[i], rids[i], k, v))
+        return i, rids[i], result, error
+
+    jobs = pool.imap(_render().render_outputs, ((payloads[i], outputs) for i in misses), ordered=ordered)
+    if not ordered:
+        for i, found in cached.items():
+            yield i, rids[i], found, None
+        for job in jobs:
+            yield finish(*job)
+        return
+
+    for i in range(len(payloads)):
+        if i in cached:
+            yield i, rids[i], cached[i], None
+        else:
+            yield finish(*next(jobs))
+
+WARMUP_PAYLOAD: dict[str, Any] = {
+    "doc_type": "invoice",
+    "doc_number": "WARMUP",
+    "issue_date": "2024-01-01",
+    "due_date": "2024-01-08",
+    "valid_until": None,
+    "proposal_ref": "WARMUP",
+    "company": {"company_name": "Warmup", "brand_accent_color": "#0A66C2", "bank_details": {"bank_name": "Bank"}},
+    "client": {"client_name": "Client"},
+    "line_items": [{"no": 1, "description": "Warmup", "unit_price": 1.0, "qty": 1, "total": 1.0}],
+    "subtotal": 1.0,
+    "tax": 0.0,
+    "total": 1.0,
+    "notes": None,
+}
+
+def warm_up() -> None:
+    """Render a throwaway document in this process and in every pool worker, so
+    imports, fonts and the first-render costs are paid before the first request.
+    Nothing is cached."""
+    render = _render()
+    render.render_outputs(WARMUP_PAYLOAD, ["pdf", "png"])
+    pool.warm(render.render_outputs, WARMUP_PAYLOAD, ["pdf", "png"])
+
+def render_job(payload: dict[str, Any], outputs: list[str]) -> tuple[str, dict[str, bytes]]:
+    ((_, rid, result, error),) = render_many([payload], outputs)
+    if error is not None:
+        raise error
+    return rid, result
+
+jobs = JobQueue(
+    settings.render_jobs_db,
+    settings.render_job_concurrency,
+    settings.render_job_max_queued,
+    settings.render_job_retention_seconds,
+    runner=render_job,
+    lease_seconds=settings.render_job_lease_seconds,
+)
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+from ..templates_default import TEMPLATES
+from .tenant_config import tenant_config
+
+_PLACEHOLDER = re.compile(r"\{\{(.*?)\}\}")
+_SCALARS = (str, int, float)
+_UNSET = object()
+
+def _compile_text(text: str) -> tuple[str, ...]:
+    """Split text into (literal, key, literal, key, ..., literal)."""
+    return tuple(_PLACEHOLDER.split(text))
+
+def _fill(parts: tuple[str, ...], values: dict[str, Any]) -> str:
+    if len(parts) == 1:
+        return parts[0]
+    out = [parts[0]]
+    for i in range(1, len(parts), 2):
+        v = values[parts[i]]
+        # only scalars are substituted; anything else leaves the placeholder as written
+        out.append(str(v) if isinstance(v, _SCALARS) else "{{" + parts[i] + "}}")
+        out.append(parts[i + 1])
+    return "".join(out)
+
+@dataclass(frozen=True, eq=False)
+class CompiledTemplate:
+    version: str
+    sections: tuple[tuple[tuple[str, ...], tuple[str, ...]], ...]
+    fields: tuple[str, ...]
+
+    def render(self, ctx: dict[str, Any]) -> str:
+        values = tuple(ctx.get(k, _UNSET) for k in self.fields)
+        # type is part of the key: 1, 1.0 and True hash alike but render differently
+        key = (self.version, tuple((type(v), v) if isinstance(v, _SCALARS) else _UNSET for v in values))
+        hit = _memo.get(key)
+        if hit is not None:
+            return hit
+
+        by_field = dict(zip(self.fields, values))
+        out = []
+        for title_parts, body_parts in self.sections:
+            title = _fill(title_parts, by_field)
+            body = _fill(body_parts, by_field)
+            if title:
+                out.append(title)
+            if body:
+                out.append(body)
+            out.append("")
+        text = "\n".join(out).strip()
+        _memo.put(key, text)
+        return text
+
+def compile_template(raw: dict[str, Any]) -> CompiledTemplate:
+    sections = []
+    fields: dict[str, None] = {}
+    for sec in raw.get("sections", []):
+        title = _compile_text((sec.get("title") or "").strip())
+        body = _compile_text((sec.get("body") or "").strip())
+        for parts in (title, body):
+            for k in parts[1::2]:
+                fields[k] = None
+        sections.append((title, body))
+    version = hashlib.sha256(json.dumps(raw, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return CompiledTemplate(version=version, sections=tuple(sections), fields=tuple(fields))
+
+def compile_templates(raw: dict[str, Any]) -> dict[str, CompiledTemplate]:
+    return {name: compile_template(t) for name, t in raw.items()}
+
+class _RenderMemo:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data: OrderedDict[tuple, str] = OrderedDict()
+
+    def get(self, key: tuple):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: tuple, value: str) -> None:
+        with self._lock:
+            self._data[key] = value
+            if len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+_memo = _RenderMemo(4096)
+
+DEFAULT_TEMPLATES = compile_templates(TEMPLATES)
+
+def templates_for(tenant: str | None) -> dict[str, CompiledTemplate]:
+    """Default templates overlaid with the tenant's templates.json, if it has one."""
+    custom = tenant_config.load(tenant, "templates", compile_templates)
+    return {**DEFAULT_TEMPLATES, **custom} if custom else DEFAULT_TEMPLATES
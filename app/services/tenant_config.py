@@ -0,0 +1,45 @@
+import json
+import os
+import re
+import threading
+from typing import Any, Callable, Optional, TypeVar
+from ..config import settings
+
+T = TypeVar("T")
+
+_TENANT = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+class TenantConfig:
+    """Per-tenant JSON files under <root>/<tenant>/<name>.json, compiled on first
+    use and recompiled when the file changes on disk (no restart needed)."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._loaded: dict[tuple[str, str], tuple[tuple[int, int], Any]] = {}
+
+    def load(self, tenant: Optional[str], name: str, compile_fn: Callable[[dict[str, Any]], T]) -> Optional[T]:
+        if not self.root or not tenant or not _TENANT.match(tenant):
+            return None
+        path = os.path.join(self.root, tenant, f"{name}.json")
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._loaded.pop((tenant, name), None)
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        key = (tenant, name)
+        with self._lock:
+            hit = self._loaded.get(key)
+        if hit is not None and hit[0] == stamp:
+            return hit[1]
+
+        with open(path, "r", encoding="utf-8") as f:
+            compiled = compile_fn(json.load(f))
+        with self._lock:
+            self._loaded[key] = (stamp, compiled)
+        return compiled
+
+tenant_config = TenantConfig(settings.tenant_config_dir)
@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional, Sequence
+
+# Below this many line items the NumPy setup costs more than it saves.
+VECTORIZE_MIN_ITEMS = 500
+
+_CENT = Decimal("0.01")
+_ONE = Decimal("1")
+_INT64_SAFE = 2 ** 62
+
+np = None
+
+def _numpy():
+    """Import NumPy with the first large document instead of at startup.
+    Returns None when it is not installed; the Decimal path is used then."""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+        np = numpy
+    return np
+
+def to_cents(value: float) -> int:
+    """Round half up (away from zero) to whole cents, from the value's shortest decimal form."""
+    return int(Decimal(str(value)).quantize(_CENT, rounding=ROUND_HALF_UP) * 100)
+
+def from_cents(cents: int) -> float:
+    return cents / 100
+
+@dataclass(frozen=True)
+class Totals:
+    line_cents: list[int]
+    subtotal_cents: int
+    tax_cents: int
+    total_cents: int
+
+    @property
+    def line_totals(self) -> list[float]:
+        return [from_cents(c) for c in self.line_cents]
+
+    @property
+    def subtotal(self) -> float:
+        return from_cents(self.subtotal_cents)
+
+    @property
+    def tax(self) -> float:
+        return from_cents(self.tax_cents)
+
+    @property
+    def total(self) -> float:
+        return from_cents(self.total_cents)
+
+def _scaled(values, scales: tuple[int, ...]):
+    """values as exact int64 multiples of 1/scale, for the smallest scale that
+    represents every value exactly; None if none does."""
+    for scale in scales:
+        ints = np.rint(values * scale)
+        if np.array_equal(ints / scale, values) and np.abs(ints).max(initial=0) < _INT64_SAFE:
+            return ints.astype(np.int64), scale
+    return None
+
+def _line_cents_vectorized(units: Sequence[float], qtys: Sequence[float]) -> Optional[list[int]]:
+    u = _scaled(np.asarray(units, dtype=np.float64), (100, 10_000))
+    q = _scaled(np.asarray(qtys, dtype=np.float64), (1, 1_000))
+    if u is None or q is None:
+        return None
+    (u_int, su), (q_int, sq) = u, q
+    if int(np.abs(u_int).max(initial=0)) * int(np.abs(q_int).max(initial=0)) >= _INT64_SAFE:
+        return None
+    prod = u_int * q_int
+    div = su * sq // 100
+    if div == 1:
+        return prod.tolist()
+    cents = (np.abs(prod) + div // 2) // div
+    return (np.sign(prod) * cents).tolist()
+
+def line_cents(units: Sequence[float], qtys: Sequence[float]) -> list[int]:
+    if len(units) >= VECTORIZE_MIN_ITEMS and _numpy() is not None:
+        cents = _line_cents_vectorized(units, qtys)
+        if cents is not None:
+            return cents
+    return [
+        int((Decimal(str(u)) * Decimal(str(q))).quantize(_CENT, rounding=ROUND_HALF_UP) * 100)
+        for u, q in zip(units, qtys)
+    ]
+
+def sum_cents(values: Sequence[float]) -> int:
+    if len(values) >= VECTORIZE_MIN_ITEMS and _numpy() is not None:
+        arr = np.asarray(values, dtype=np.float64)
+        scaled = _scaled(arr, (100,))
+        if scaled is not None:
+            return int(scaled[0].sum())
+    return sum(to_cents(v) for v in values)
+
+def compute_totals(units: Sequence[float], qtys: Sequence[float], tax_rate: float) -> Totals:
+    """Line totals, subtotal, tax and total in integer cents. Consistent by construction,
+    so the result always passes check_totals."""
+    cents = line_cents(units, qtys)
+    subtotal = sum(cents)
+    tax = int((Decimal(subtotal) * Decimal(str(tax_rate))).quantize(_ONE, rounding=ROUND_HALF_UP))
+    return Totals(line_cents=cents, subtotal_cents=subtotal, tax_cents=tax, total_cents=subtotal + tax)
+
+def check_totals(line_totals: Sequence[float], subtotal: float, tax: float, total: float) -> None:
+    calc = sum_cents(line_totals)
+    sub = to_cents(subtotal)
+    if sub != calc:
+        raise ValueError(f"Subtotal mismatch: expected {from_cents(calc)}, got {subtotal}")
+    if sub + to_cents(tax) != to_cents(total):
+        raise ValueError("Total mismatch: subtotal + tax != total")
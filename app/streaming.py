@@ -0,0 +1,117 @@
+import io
+import json
+import re
+import tempfile
+from typing import Any, BinaryIO, Iterator, Union
+from fastapi import Request
+
+SPOOL_MAX_MEMORY = 1024 * 1024
+READ_SIZE = 64 * 1024
+MAX_ITEM_CHARS = 4 * 1024 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DELIMITERS = " \t\n\r,]"
+
+class ItemError(Exception):
+    pass
+
+async def spool_body(request: Request) -> BinaryIO:
+    """Copy the request body into a temp file that stays in memory up to 1 MiB.
+    Parsing from the spool keeps memory bounded without reading the request
+    while a streaming response is being sent."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+def iter_json_items(body: BinaryIO) -> Iterator[Union[Any, ItemError]]:
+    """Yield each item of a JSON array or NDJSON body, one at a time. A line that
+    fails to parse yields an ItemError in its place; a broken array stops after one."""
+    text = io.TextIOWrapper(body, encoding="utf-8")
+    buf = ""
+    while True:
+        chunk = text.read(READ_SIZE)
+        buf += chunk
+        stripped = buf.lstrip()
+        if stripped or not chunk:
+            break
+    if stripped.startswith("["):
+        yield from _iter_array(text, stripped[1:])
+    else:
+        yield from _iter_lines(text, buf)
+
+def _iter_lines(text: io.TextIOWrapper, buf: str) -> Iterator[Union[Any, ItemError]]:
+    while True:
+        *lines, buf = buf.split("\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(line)
+        if len(buf) > MAX_ITEM_CHARS:
+            yield ItemError("Item too large")
+            return
+        chunk = text.read(READ_SIZE)
+        if not chunk:
+            break
+        buf += chunk
+    if buf.strip():
+        yield _parse_line(buf)
+
+def _parse_line(line: str) -> Union[Any, ItemError]:
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ItemError(f"Invalid JSON: {e}")
+
+def _iter_array(text: io.TextIOWrapper, buf: str) -> Iterator[Union[Any, ItemError]]:
+    # buf is only trimmed to pos when the next chunk is read, so a chunk of many
+    # small items is not copied once per item
+    decoder = json.JSONDecoder()
+    pos = 0
+    eof = False
+    # "[" is followed by an item or "]"; an item by exactly one "," or "]"; a "," by an item
+    after_item = False
+    first = True
+    while True:
+        pos = _WHITESPACE.match(buf, pos).end()
+        if pos < len(buf):
+            ch = buf[pos]
+            if after_item:
+                if ch == "]":
+                    return
+                if ch != ",":
+                    yield ItemError(f"Invalid JSON array: expected ',' or ']' after an item, got {ch!r}")
+                    return
+                pos += 1
+                after_item = False
+                continue
+            if ch in ",]":
+                if ch == "]" and first:
+                    return
+                yield ItemError(f"Invalid JSON array: expected an item, got {ch!r}")
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError as e:
+                if eof:
+                    yield ItemError(f"Invalid JSON array: {e}")
+                    return
+            else:
+                # a number is only complete once a delimiter follows it: "-9" may be
+                # the start of "-9.5e3" when the chunk ends at "-9" or "-9."
+                number = isinstance(item, (int, float)) and not isinstance(item, bool)
+                if eof or (end < len(buf) and not (number and buf[end] not in _DELIMITERS)):
+                    yield item
+                    pos = end
+                    after_item, first = True, False
+                    continue
+        elif eof:
+            yield ItemError("Unterminated JSON array")
+            return
+        if len(buf) - pos > MAX_ITEM_CHARS:
+            yield ItemError("Item too large")
+            return
+        chunk = text.read(READ_SIZE)
+        eof = not chunk
+        buf = buf[pos:] + chunk
+        pos = 0
@@ -0,0 +1,64 @@
+"""PDF size and CPU cost of the compact and linearized modes vs. the default.
+
+    python -m bench.bench_compact [--rows 20,200,2000,10000] [--max-overhead 25]
+
+Prints JSON. Per row count and mode: best-of --repeat seconds, output bytes,
+size relative to the default, and the compression ratio (uncompressed / actual).
+Linearized is measured only when pikepdf is installed. Exits 1 if compact output
+is not smaller than the default, or if it costs more than --max-overhead percent
+extra time.
+"""
+import argparse
+import json
+import sys
+import time
+
+from app.services.pdf_tools import can_linearize, pdf_stats
+from app.services.render import page_plan, render_pdf
+from bench.payloads import render_payload
+
+def _best(payload: dict, mode: str, repeat: int) -> tuple[float, bytes]:
+    best, data = float("inf"), b""
+    for _ in range(repeat):
+        t = time.perf_counter()
+        data = render_pdf(payload, mode)
+        best = min(best, time.perf_counter() - t)
+    return best, data
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", default="20,200,2000,10000")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--max-overhead", type=float, default=25.0, help="max extra time of compact vs default, percent")
+    args = ap.parse_args()
+
+    modes = ["default", "compact"] + (["linearized"] if can_linearize() else [])
+    results = []
+    ok = True
+    for rows in [int(r) for r in args.rows.split(",")]:
+        payload = render_payload(rows)
+        repeat = args.repeat if rows < 5000 else 1
+        row = {"rows": rows, "pages": len(page_plan(rows)), "modes": {}}
+        base_seconds = base_bytes = None
+        for mode in modes:
+            seconds, data = _best(payload, mode, repeat)
+            size, raw = pdf_stats(data)
+            if mode == "default":
+                base_seconds, base_bytes = seconds, size
+            row["modes"][mode] = {
+                "seconds": round(seconds, 4),
+                "bytes": size,
+                "size_vs_default": round(size / base_bytes, 3),
+                "extra_cpu_pct": round((seconds - base_seconds) / base_seconds * 100, 1),
+                # default streams are ASCII85 on top of Flate and are counted as stored
+                "compression_ratio": round(raw / size, 2) if mode != "default" else None,
+            }
+        compact = row["modes"]["compact"]
+        ok = ok and compact["bytes"] < base_bytes and compact["extra_cpu_pct"] <= args.max_overhead
+        results.append(row)
+
+    print(json.dumps({"linearize_available": can_linearize(), "results": results, "ok": ok}, indent=2))
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
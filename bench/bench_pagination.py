@@ -0,0 +1,60 @@
+"""Render time and layout memory vs. line-item count.
+
+    python -m bench.bench_pagination [--rows 10,100,1000,10000] [--max-ratio 1.5]
+
+Prints JSON. Exits 1 if time per row at the largest size is more than
+--max-ratio times the time per row at the second largest (i.e. not linear).
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from app.services.render import page_plan, pages, render_pdf
+from bench.payloads import render_payload
+
+def layout_peak_bytes(payload: dict) -> int:
+    tracemalloc.start()
+    for _ in pages(payload):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", default="10,100,1000,10000")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--max-ratio", type=float, default=1.5)
+    args = ap.parse_args()
+
+    results = []
+    for rows in [int(r) for r in args.rows.split(",")]:
+        payload = render_payload(rows)
+        best = float("inf")
+        size = 0
+        for _ in range(args.repeat if rows < 5000 else 1):
+            t = time.perf_counter()
+            size = len(render_pdf(payload))
+            best = min(best, time.perf_counter() - t)
+        results.append({
+            "rows": rows,
+            "pages": len(page_plan(rows)),
+            "seconds": round(best, 4),
+            "us_per_row": round(best / rows * 1e6, 1),
+            "pdf_bytes": size,
+            "layout_peak_bytes": layout_peak_bytes(payload),
+        })
+
+    ok = True
+    if len(results) >= 2:
+        ratio = results[-1]["us_per_row"] / results[-2]["us_per_row"]
+        ok = ratio <= args.max_ratio
+        print(json.dumps({"results": results, "per_row_ratio": round(ratio, 3), "linear": ok}, indent=2))
+    else:
+        print(json.dumps({"results": results}, indent=2))
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Cold-start cost: app import, first renders, and server time to /health and /ready.
+
+    python -m bench.bench_startup [--repeat 3] [--workers 0]
+
+Every measurement runs in a fresh interpreter. Prints JSON with the median
+of --repeat runs.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+_IMPORT = """
+import json, time
+t = time.perf_counter()
+import app.main
+print(json.dumps({"import_app_seconds": time.perf_counter() - t}))
+"""
+
+_FIRST_RENDER = """
+import json, time
+from app.services.render_store import WARMUP_PAYLOAD as payload
+t = time.perf_counter()
+from app.services.render import render_pdf, render_png
+imported = time.perf_counter() - t
+t = time.perf_counter()
+render_pdf(payload)
+pdf = time.perf_counter() - t
+t = time.perf_counter()
+render_png(payload)
+png = time.perf_counter() - t
+t = time.perf_counter()
+render_pdf(payload)
+render_png(payload)
+warm = time.perf_counter() - t
+print(json.dumps({"import_render_seconds": imported, "first_pdf_seconds": pdf, "first_png_seconds": png, "warm_pdf_png_seconds": warm}))
+"""
+
+def _python(code: str, env: dict) -> dict:
+    out = subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _status(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as r:
+            return r.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+def _server(env: dict, timeout: float = 60.0) -> dict:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    out = {"health_seconds": None, "ready_seconds": None}
+    try:
+        while time.perf_counter() - started < timeout and out["ready_seconds"] is None:
+            if out["health_seconds"] is None and _status(base + "/health") == 200:
+                out["health_seconds"] = time.perf_counter() - started
+            if out["health_seconds"] is not None and _status(base + "/ready") == 200:
+                out["ready_seconds"] = time.perf_counter() - started
+            time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return out
+
+def _median(runs: list[dict]) -> dict:
+    return {
+        k: round(statistics.median(r[k] for r in runs), 4) if all(r[k] is not None for r in runs) else None
+        for k in runs[0]
+    }
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--workers", type=int, default=0, help="RENDER_WORKERS for the server runs")
+    args = ap.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": root, "RENDER_CACHE_DIR": "", "RENDER_WORKERS": str(args.workers)}
+    env["RENDER_JOBS_DB"] = os.path.join("/tmp", f"bench-startup-{os.getpid()}.sqlite3")
+
+    result = {
+        "workers": args.workers,
+        "import": _median([_python(_IMPORT, env) for _ in range(args.repeat)]),
+        "render": _median([_python(_FIRST_RENDER, env) for _ in range(args.repeat)]),
+        "server": _median([_server(env) for _ in range(args.repeat)]),
+    }
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(env["RENDER_JOBS_DB"] + suffix)
+        except FileNotFoundError:
+            pass
+    print(json.dumps(result, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
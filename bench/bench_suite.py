@@ -0,0 +1,155 @@
+"""Microbenchmarks for every service hot path, with a baseline regression gate.
+
+    python -m bench.bench_suite [--filter render.] [--out current.json]
+    python -m bench.bench_suite --baseline baseline.json [--threshold 10]
+
+Each case is timed with timeit's autorange (at least 0.2 s per run), --repeat
+runs; the median seconds per call is what gets compared. Prints JSON. With
+--baseline, exits 1 if any case present in both files got slower by more than
+--threshold percent.
+"""
+import argparse
+import itertools
+import json
+import platform
+import statistics
+import sys
+import time
+import timeit
+from typing import Callable
+
+from bench import payloads
+
+def _render_cases() -> dict[str, Callable[[], object]]:
+    from app.services.raster_profiles import PROFILES
+    from app.services.render import _draw_image, _draw_pdf, pages, render_pdf, render_png
+    cases = {}
+    for rows in (1, 20, 200):
+        p = payloads.render_payload(rows)
+        cases[f"render.layout[rows={rows}]"] = lambda p=p: list(pages(p))
+        cases[f"render.pdf[rows={rows}]"] = lambda p=p: render_pdf(p)
+    p = payloads.render_payload(20)
+    prepared = list(pages(p))
+    first = prepared[0]
+    # the drawing stages on a prepared display list, without layout
+    cases["render.pdf_draw[rows=20]"] = lambda: _draw_pdf(iter(prepared), p)
+    for name, profile in PROFILES.items():
+        cases[f"render.raster[profile={name}]"] = lambda profile=profile: _draw_image(first, profile)
+    cases["render.png[rows=20]"] = lambda: render_png(p)
+    return cases
+
+def _template_cases() -> dict[str, Callable[[], object]]:
+    from app.services.templating import DEFAULT_TEMPLATES, compile_template
+    cases = {}
+    counter = itertools.count()
+    for keys in (5, 50, 500):
+        raw, ctx = payloads.template_spec(keys)
+        tpl = compile_template(raw)
+
+        def cold(tpl=tpl, ctx=ctx):
+            # a new value each call, so the render memo never hits
+            return tpl.render({**ctx, "field_0": next(counter)})
+
+        cases[f"templates.render[keys={keys}]"] = cold
+        cases[f"templates.render_memo[keys={keys}]"] = lambda tpl=tpl, ctx=ctx: tpl.render(ctx)
+    ctx = {"company_name": "Bench Co", "client_name": "Client Ltd", "proposal_ref": "SOP-BENCH"}
+
+    def proposal_set():
+        c = {**ctx, "proposal_ref": next(counter)}
+        return [t.render(c) for t in DEFAULT_TEMPLATES.values()]
+
+    cases["templates.proposal_set"] = proposal_set
+    return cases
+
+def _intent_cases() -> dict[str, Callable[[], object]]:
+    from app.services.intent import parse_intent
+    cases = {}
+    for chars in (100, 10_000, 1_000_000):
+        text = payloads.proposal_text(chars)
+        cases[f"intent.parse[chars={chars}]"] = lambda text=text: parse_intent(text)
+    return cases
+
+def _compliance_cases() -> dict[str, Callable[[], object]]:
+    from app.services.compliance import enforce_no_weak_language
+    cases = {}
+    for chars in (1_000, 100_000):
+        text = payloads.compliance_text(chars)
+        cases[f"compliance.enforce[chars={chars}]"] = lambda text=text: enforce_no_weak_language(text)
+    return cases
+
+def _totals_cases() -> dict[str, Callable[[], object]]:
+    from app.services.documents import build_document
+    from app.schemas import BuildDocumentIn
+    from app.services.totals import compute_totals
+    cases = {}
+    for rows in (10, 1_000, 10_000):
+        items = payloads.line_items(rows)
+        units = [it["unit_price"] for it in items]
+        qtys = [float(it["qty"]) for it in items]
+        cases[f"totals.compute[rows={rows}]"] = lambda u=units, q=qtys: compute_totals(u, q, 0.15)
+        doc_in = BuildDocumentIn.model_validate(payloads.build_document_in(rows))
+        cases[f"build.document[rows={rows}]"] = lambda d=doc_in: build_document(d)
+    return cases
+
+GROUPS = (_render_cases, _template_cases, _intent_cases, _compliance_cases, _totals_cases)
+
+def measure(fn: Callable[[], object], repeat: int) -> dict:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    per_call = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {"seconds": statistics.median(per_call), "best": min(per_call), "number": number, "repeat": repeat}
+
+def _versions() -> dict:
+    out = {"python": platform.python_version()}
+    for mod in ("reportlab", "PIL", "numpy", "pydantic", "fastapi"):
+        try:
+            out[mod] = __import__(mod).__version__
+        except (ImportError, AttributeError):
+            out[mod] = None
+    return out
+
+def compare(current: dict, baseline: dict, threshold: float) -> dict:
+    rows = {}
+    for name, cur in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        change = (cur["seconds"] - base["seconds"]) / base["seconds"] * 100
+        rows[name] = {"baseline": base["seconds"], "current": cur["seconds"], "change_pct": round(change, 1), "regressed": change > threshold}
+    return rows
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--filter", default="", help="comma-separated substrings; only matching cases run")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--out", help="also write the results JSON here")
+    ap.add_argument("--baseline", help="results JSON from an earlier run to compare against")
+    ap.add_argument("--threshold", type=float, default=10.0, help="max allowed slowdown, percent")
+    args = ap.parse_args()
+
+    wanted = [f for f in args.filter.split(",") if f]
+    results = {}
+    for group in GROUPS:
+        for name, fn in group().items():
+            if wanted and not any(w in name for w in wanted):
+                continue
+            results[name] = measure(fn, args.repeat)
+            print(f"{name}: {results[name]['seconds'] * 1e6:.1f} us", file=sys.stderr)
+
+    report = {"meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "versions": _versions()}, "results": results}
+    ok = True
+    if args.baseline:
+        with open(args.baseline) as f:
+            rows = compare(report, json.load(f), args.threshold)
+        report["comparison"] = {"threshold_pct": args.threshold, "cases": rows}
+        ok = not any(r["regressed"] for r in rows.values())
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
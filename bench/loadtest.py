@@ -0,0 +1,397 @@
+"""End-to-end load test: app.main:app under uvicorn, driven by an open-loop asyncio client.
+
+    python -m bench.loadtest [--mix generate=70,build=20,render=10] [--rates 5,10,20,40]
+                             [--duration 15] [--render-workers 0,2] [--uvicorn-workers 1]
+
+For every (uvicorn workers, RENDER_WORKERS) pair a fresh server is started with a
+random SOVEREIGN_INTERNAL_KEY that the client sends as X-Internal-Key. The client
+waits for /ready, then sends each --rates step for --duration seconds.
+
+Arrivals are open-loop at a fixed rate and do not wait for earlier responses.
+Latency runs from when a request was due to when its response was fully read.
+When the server falls behind, the time spent queued for a connection counts too.
+Every request has a unique payload, so renders never hit the render cache.
+
+Prints JSON, with a summary table on stderr. Each step reports throughput,
+per-endpoint p50/p95/p99/max latency, error rates, and the peak RSS of the server
+process tree. RSS is per process, so it cannot be split between endpoints in a
+mixed run; for that, run one endpoint alone, e.g. --mix render=100. Each worker
+config gets a `sustainable_rps`: the highest rate that met --slo-p99-ms and
+--slo-error-rate while keeping up with the schedule. `knee_rps` is the first rate
+that missed.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from bench import payloads
+
+_TOKEN = "@@LOADSEQ@@"
+# unique across steps too, so a later step never replays an earlier payload
+_SEQ = itertools.count()
+
+def _bodies() -> dict[str, tuple[str, str, bytes]]:
+    """(path, accept, body template) per endpoint. _TOKEN is replaced by a sequence
+    number per request, which makes every payload unique."""
+    generate = {
+        "user_id": "load",
+        "proposal_ref": f"SOP-LOAD/{_TOKEN}",
+        "input_raw": payloads.proposal_text(1500),
+        "options": {"client_name": "Client Ltd", "company_name": "Load Co"},
+    }
+    build = payloads.build_document_in(20)
+    build["proposal"] = {"proposal_ref": f"SOP-LOAD/{_TOKEN}"}
+    render = payloads.render_payload(20)
+    render["doc_number"] = f"INV-LOAD-{_TOKEN}"
+    return {
+        "generate": ("/v1/proposals/generate", "application/json", json.dumps(generate).encode()),
+        "build": ("/v1/commerce/build-document", "application/json", json.dumps(build).encode()),
+        "render": ("/v1/render/invoice-quote?outputs=pdf", "application/pdf", json.dumps(render).encode()),
+    }
+
+def _parse_mix(text: str) -> dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    return mix
+
+# HTTP CLIENT
+class _Pool:
+    """Keep-alive HTTP/1.1 connections, at most `size` open at once."""
+
+    def __init__(self, host: str, port: int, size: int):
+        self.host, self.port = host, port
+        self._slots = asyncio.Semaphore(size)
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def request(self, raw: bytes) -> int:
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else await asyncio.open_connection(self.host, self.port)
+            try:
+                reader, writer = conn
+                writer.write(raw)
+                status, keep = await _read_response(reader)
+            except BaseException:
+                conn[1].close()
+                raise
+            if keep:
+                self._idle.append(conn)
+            else:
+                writer.close()
+            return status
+
+    def close(self) -> None:
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+async def _read_response(reader: asyncio.StreamReader) -> tuple[int, bool]:
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.split(b"\r\n")
+    status = int(lines[0].split()[1])
+    length, chunked, keep = None, False, True
+    for line in lines[1:]:
+        name, _, value = line.partition(b":")
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == b"content-length":
+            length = int(value)
+        elif name == b"transfer-encoding":
+            chunked = b"chunked" in value
+        elif name == b"connection":
+            keep = value != b"close"
+    if chunked:
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length is not None:
+        await reader.readexactly(length)
+    else:
+        await reader.read()
+        keep = False
+    return status, keep
+
+def _request_bytes(host: str, key: str, path: str, accept: str, body: bytes) -> bytes:
+    head = (
+        f"POST {path} HTTP/1.1\r\nHost: {host}\r\nX-Internal-Key: {key}\r\nAccept: {accept}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+# SERVER
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _status(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as r:
+            return r.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+def _start_server(port: int, uvicorn_workers: int, render_workers: int, key: str, tmp: str) -> subprocess.Popen:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {
+        **os.environ,
+        "PYTHONPATH": root,
+        "SOVEREIGN_INTERNAL_KEY": key,
+        "RENDER_WORKERS": str(render_workers),
+        "RENDER_CACHE_DIR": "",
+        "ARCHIVE_DIR": "",
+        "RENDER_JOBS_DB": os.path.join(tmp, "jobs.sqlite3"),
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(uvicorn_workers), "--log-level", "warning", "--no-access-log"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+def _wait_ready(proc: subprocess.Popen, base: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        if _status(base + "/ready") == 200:
+            return
+        time.sleep(0.05)
+    raise RuntimeError(f"server not ready after {timeout:g}s")
+
+def _tree_rss(root_pid: int) -> int:
+    """Resident bytes of root_pid and all its descendants (Linux /proc), 0 elsewhere."""
+    children: dict[int, list[int]] = {}
+    rss: dict[int, int] = {}
+    page = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return 0
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # the command name may contain spaces; fields after it are fixed
+        fields = stat[stat.rindex(")") + 2:].split()
+        pid = int(entry)
+        children.setdefault(int(fields[1]), []).append(pid)
+        rss[pid] = int(fields[21]) * page
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, ()))
+    return total
+
+# LOAD
+def _percentile(sorted_values: list[float], pct: float) -> float | None:
+    if not sorted_values:
+        return None
+    # nearest rank
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+def _latency(values: list[float]) -> dict:
+    values = sorted(values)
+    ms = lambda v: round(v * 1e3, 2) if v is not None else None
+    return {
+        "p50_ms": ms(_percentile(values, 50)),
+        "p95_ms": ms(_percentile(values, 95)),
+        "p99_ms": ms(_percentile(values, 99)),
+        "max_ms": ms(values[-1] if values else None),
+    }
+
+async def _run_step(pool: _Pool, requests: dict, kinds: list[str], rate: float, duration: float, timeout: float, pid: int) -> dict:
+    loop = asyncio.get_running_loop()
+    results: dict[str, dict] = {k: {"latencies": [], "errors": 0, "statuses": {}} for k in requests}
+    peak_rss = 0
+    done = asyncio.Event()
+
+    async def sample_rss():
+        nonlocal peak_rss
+        while not done.is_set():
+            peak_rss = max(peak_rss, await loop.run_in_executor(None, _tree_rss, pid))
+            await asyncio.sleep(0.1)
+
+    async def one(kind: str, due: float):
+        template = requests[kind]
+        # same width as the token, so Content-Length still holds
+        raw = template.replace(_TOKEN.encode(), b"%0*d" % (len(_TOKEN), next(_SEQ)))
+        r = results[kind]
+        try:
+            status = await asyncio.wait_for(pool.request(raw), timeout)
+        except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError, ValueError) as e:
+            r["errors"] += 1
+            name = type(e).__name__
+            r["statuses"][name] = r["statuses"].get(name, 0) + 1
+            return
+        r["statuses"][str(status)] = r["statuses"].get(str(status), 0) + 1
+        if 200 <= status < 300:
+            r["latencies"].append(loop.time() - due)
+        else:
+            r["errors"] += 1
+
+    sampler = asyncio.create_task(sample_rss())
+    tasks = []
+    start = loop.time()
+    n = int(rate * duration)
+    for i in range(n):
+        due = start + i / rate
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(kinds[i % len(kinds)], due)))
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - start
+    done.set()
+    await sampler
+
+    report: dict = {"target_rps": rate, "sent": n, "elapsed_seconds": round(elapsed, 2), "endpoints": {}}
+    all_latencies: list[float] = []
+    ok = errors = 0
+    for kind, r in results.items():
+        sent = len(r["latencies"]) + r["errors"]
+        if not sent:
+            continue
+        ok += len(r["latencies"])
+        errors += r["errors"]
+        all_latencies += r["latencies"]
+        report["endpoints"][kind] = {
+            "sent": sent,
+            "throughput_rps": round(len(r["latencies"]) / elapsed, 2),
+            "error_rate": round(r["errors"] / sent, 4),
+            "statuses": r["statuses"],
+            **_latency(r["latencies"]),
+        }
+    report.update({
+        "throughput_rps": round(ok / elapsed, 2),
+        "error_rate": round(errors / n, 4) if n else 0.0,
+        **_latency(all_latencies),
+        "peak_rss_mb": round(peak_rss / 2**20, 1),
+    })
+    return report
+
+async def _run_config(args, requests_by_kind: dict, kinds: list[str], pid: int, port: int) -> list[dict]:
+    pool = _Pool("127.0.0.1", port, args.connections)
+    steps = []
+    try:
+        if args.warmup > 0:
+            await _run_step(pool, requests_by_kind, kinds, min(args.rates), args.warmup, args.timeout, pid)
+        for rate in sorted(args.rates):
+            step = await _run_step(pool, requests_by_kind, kinds, rate, args.duration, args.timeout, pid)
+            steps.append(step)
+            print(
+                f"  {rate:>7g} rps -> {step['throughput_rps']:>7g} ok/s  p50 {step['p50_ms']} ms  p99 {step['p99_ms']} ms"
+                f"  errors {step['error_rate']:.2%}  rss {step['peak_rss_mb']} MB",
+                file=sys.stderr,
+            )
+    finally:
+        pool.close()
+    return steps
+
+def _meets_slo(step: dict, args) -> bool:
+    # keeping up: every request of the step finished within one extra second
+    return (
+        step["p99_ms"] is not None
+        and step["p99_ms"] <= args.slo_p99_ms
+        and step["error_rate"] <= args.slo_error_rate
+        and step["elapsed_seconds"] <= args.duration + 1.0
+    )
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ints = lambda s: [int(x) for x in s.split(",") if x]
+    floats = lambda s: [float(x) for x in s.split(",") if x]
+    ap.add_argument("--mix", type=_parse_mix, default=_parse_mix("generate=70,build=20,render=10"),
+                    help="endpoint=weight pairs from generate, build, render")
+    ap.add_argument("--rates", type=floats, default=floats("5,10,20,40"), help="target requests/second, one step each")
+    ap.add_argument("--duration", type=float, default=15.0, help="seconds per step")
+    ap.add_argument("--warmup", type=float, default=3.0, help="seconds at the lowest rate before measuring")
+    ap.add_argument("--render-workers", type=ints, default=ints("0,2"), help="RENDER_WORKERS values to sweep")
+    ap.add_argument("--uvicorn-workers", type=ints, default=ints("1"), help="uvicorn --workers values to sweep")
+    ap.add_argument("--connections", type=int, default=64, help="max concurrent client connections")
+    ap.add_argument("--timeout", type=float, default=30.0, help="per-request timeout, seconds")
+    ap.add_argument("--slo-p99-ms", type=float, default=500.0)
+    ap.add_argument("--slo-error-rate", type=float, default=0.01)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", help="also write the report JSON here")
+    args = ap.parse_args()
+
+    bodies = _bodies()
+    unknown = set(args.mix) - set(bodies)
+    if unknown:
+        ap.error(f"unknown endpoints in --mix: {', '.join(sorted(unknown))}")
+    # a fixed shuffled sequence, so every step and config replays the same mix
+    rng = random.Random(args.seed)
+    names = [k for k, w in args.mix.items() if w > 0]
+    kinds = rng.choices(names, weights=[args.mix[k] for k in names], k=1000)
+
+    key = secrets.token_hex(16)
+    configs = []
+    for uw in args.uvicorn_workers:
+        for rw in args.render_workers:
+            print(f"uvicorn_workers={uw} render_workers={rw}", file=sys.stderr)
+            port = _free_port()
+            requests_by_kind = {
+                k: _request_bytes(f"127.0.0.1:{port}", key, path, accept, body) for k, (path, accept, body) in bodies.items()
+            }
+            with tempfile.TemporaryDirectory(prefix="loadtest-") as tmp:
+                proc = _start_server(port, uw, rw, key, tmp)
+                try:
+                    started = time.monotonic()
+                    _wait_ready(proc, f"http://127.0.0.1:{port}", 120.0)
+                    ready_seconds = round(time.monotonic() - started, 2)
+                    steps = asyncio.run(_run_config(args, requests_by_kind, kinds, proc.pid, port))
+                finally:
+                    proc.terminate()
+                    proc.wait(timeout=30)
+            passing = [s["target_rps"] for s in steps if _meets_slo(s, args)]
+            failing = [s["target_rps"] for s in steps if not _meets_slo(s, args)]
+            configs.append({
+                "uvicorn_workers": uw,
+                "render_workers": rw,
+                "ready_seconds": ready_seconds,
+                "sustainable_rps": max((r for r in passing if not failing or r < min(failing)), default=None),
+                "knee_rps": min(failing, default=None),
+                "steps": steps,
+            })
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "cpus": os.cpu_count(),
+            "mix": args.mix,
+            "duration_seconds": args.duration,
+            "slo": {"p99_ms": args.slo_p99_ms, "error_rate": args.slo_error_rate},
+        },
+        "configs": configs,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Deterministic synthetic inputs for the benchmarks, parameterised by size."""
+import random
+
+_WORDS = (
+    "delivery support retainer monthly build develop scope project partner tender compliance "
+    "integration onboarding reporting dashboard migration audit training rollout analytics "
+    "platform workflow automation review strategy budget pipeline timeline milestone"
+).split()
+
+def _words(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(n))
+
+def line_items(rows: int, desc_words: int = 8, seed: int = 1) -> list[dict]:
+    rng = random.Random(seed)
+    items = []
+    for i in range(1, rows + 1):
+        unit = round(rng.uniform(10, 5000), 2)
+        qty = rng.randint(1, 20)
+        items.append({"no": i, "description": _words(rng, desc_words), "unit_price": unit, "qty": qty, "total": round(unit * qty, 2)})
+    return items
+
+def render_payload(rows: int, desc_words: int = 8, seed: int = 1) -> dict:
+    """A RenderPayload dict with `rows` line items and consistent totals."""
+    items = line_items(rows, desc_words, seed)
+    subtotal = round(sum(it["total"] for it in items), 2)
+    return {
+        "doc_type": "invoice",
+        "doc_number": f"INV-BENCH-{rows}",
+        "issue_date": "2024-01-01",
+        "due_date": "2024-01-08",
+        "valid_until": None,
+        "proposal_ref": "SOP-BENCH",
+        "company": {
+            "company_name": "Bench Co",
+            "tagline": "Execution partners",
+            "billing_address": "1 Bench Street, Cape Town",
+            "reg_number": "2024/000001/07",
+            "vat_number": "4000000001",
+            "brand_accent_color": "#0A66C2",
+            "payment_terms_default": "NET 7",
+            "bank_details": {"bank_name": "Bank", "account_name": "Bench Co", "account_number": "000111222", "branch_code": "250655"},
+            "email": "billing@bench.example",
+            "website": "bench.example",
+            "signatory_name": "A. Bench",
+            "signatory_role": "Director",
+        },
+        "client": {"client_name": "Client Ltd", "client_entity": "Client Holdings", "client_email": "ap@client.example", "client_address": "2 Client Road"},
+        "line_items": items,
+        "subtotal": subtotal,
+        "tax": 0.0,
+        "total": subtotal,
+        "notes": None,
+    }
+
+def proposal_text(chars: int, seed: int = 2) -> str:
+    """Free-text deal description of about `chars` characters with money and timeline hints."""
+    rng = random.Random(seed)
+    head = "Monthly retainer for platform build, budget R 45,000 per month, kickoff in 2 weeks. "
+    out = [head]
+    size = len(head)
+    while size < chars:
+        w = _words(rng, 12) + ". "
+        out.append(w)
+        size += len(w)
+    return "".join(out)[:chars]
+
+def compliance_text(chars: int, weak_every: int = 40, seed: int = 3) -> str:
+    """Proposal-like text with a weak phrase about every `weak_every` words and a CTA at the end."""
+    rng = random.Random(seed)
+    weak = ["maybe", "we think", "hopefully", "kind of", "sort of", "i think"]
+    out = []
+    size = 0
+    i = 0
+    while size < chars:
+        w = rng.choice(weak) if i % weak_every == 0 else rng.choice(_WORDS)
+        out.append(w)
+        size += len(w) + 1
+        i += 1
+    return " ".join(out)[:chars] + "\nNext step: confirm the scope."
+
+def template_spec(keys: int) -> tuple[dict, dict]:
+    """(raw template, context) with `keys` placeholders spread over sections of five."""
+    sections = []
+    for s in range(0, keys, 5):
+        names = [f"field_{k}" for k in range(s, min(s + 5, keys))]
+        sections.append({"title": f"Section {s // 5} {{{{{names[0]}}}}}", "body": " / ".join(f"{n}: {{{{{n}}}}}" for n in names)})
+    ctx = {f"field_{k}": f"value {k}" for k in range(keys)}
+    return {"sections": sections}, ctx
+
+def build_document_in(rows: int, seed: int = 4) -> dict:
+    """A BuildDocumentIn dict with `rows` override line items."""
+    items = [{"description": it["description"], "unit_price": it["unit_price"], "qty": it["qty"]} for it in line_items(rows, seed=seed)]
+    return {
+        "user_id": "bench",
+        "proposal_id": "bench",
+        "doc_type": "invoice",
+        "overrides": {"line_items": items, "tax_rate": 0.15},
+        "identity_profile": {"company_name": "Bench Co"},
+        "visual_financial_profile": {"brand_accent_color": "#0A66C2"},
+        "client_profile": {"client_name": "Client Ltd"},
+        "proposal": {"proposal_ref": "SOP-BENCH"},
+    }
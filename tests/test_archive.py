@@ -0,0 +1,41 @@
+import sqlite3
+
+from app.services.archive import DocumentArchive
+
+def _payload(user_id, doc_number="INV-2024-001", proposal_ref="SOP-2024/001"):
+    return {"user_id": user_id, "doc_number": doc_number, "proposal_ref": proposal_ref, "doc_type": "invoice"}
+
+def test_same_doc_number_is_kept_per_tenant(tmp_path):
+    archive = DocumentArchive(str(tmp_path))
+    archive.store(_payload("tenant-a"), "rid-a", "pdf", b"%PDF a")
+    archive.store(_payload("tenant-b"), "rid-b", "pdf", b"%PDF b")
+    assert archive.get("tenant-a", "INV-2024-001", "pdf")["render_id"] == "rid-a"
+    assert archive.get("tenant-b", "INV-2024-001", "pdf")["render_id"] == "rid-b"
+    assert archive.get("", "INV-2024-001", "pdf") is None
+    assert [d["render_id"] for d in archive.by_proposal("tenant-a", "SOP-2024/001")] == ["rid-a"]
+    archive.close()
+
+def test_payload_without_user_id_is_unscoped(tmp_path):
+    archive = DocumentArchive(str(tmp_path))
+    archive.store(_payload(None), "rid", "png", b"png")
+    assert archive.get("", "INV-2024-001", "png")["render_id"] == "rid"
+    assert archive.get("tenant-a", "INV-2024-001", "png") is None
+    archive.close()
+
+def test_index_from_before_tenants_is_migrated(tmp_path):
+    db = sqlite3.connect(tmp_path / "index.sqlite3")
+    db.executescript("""
+        CREATE TABLE documents (
+            doc_number TEXT NOT NULL, kind TEXT NOT NULL, sha256 TEXT NOT NULL, size INTEGER NOT NULL,
+            render_id TEXT NOT NULL, proposal_ref TEXT NOT NULL, doc_type TEXT NOT NULL, created_at REAL NOT NULL,
+            PRIMARY KEY (doc_number, kind)
+        );
+        CREATE INDEX documents_proposal_ref ON documents (proposal_ref, created_at);
+        INSERT INTO documents VALUES ('INV-1', 'pdf', 'ab', 2, 'rid-old', 'SOP-1', 'invoice', 1.0);
+    """)
+    db.close()
+    archive = DocumentArchive(str(tmp_path))
+    assert archive.get("", "INV-1", "pdf")["render_id"] == "rid-old"
+    archive.store(_payload("tenant-a", "INV-1"), "rid-a", "pdf", b"%PDF a")
+    assert archive.get("", "INV-1", "pdf")["render_id"] == "rid-old"
+    archive.close()
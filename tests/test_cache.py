@@ -0,0 +1,33 @@
+import os
+import time
+
+from app.services.cache import ByteCache
+
+def _files(root):
+    return sorted(name for _, _, names in os.walk(root) for name in names)
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = ByteCache(0, str(tmp_path), disk_max_bytes=3500)
+    for i in range(3):
+        cache.put(f"a{i}", b"x" * 1000)
+        # mtime resolution differs between filesystems; make the order explicit
+        os.utime(cache._disk_path(f"a{i}"), (time.time() - 100 + i, time.time() - 100 + i))
+    assert cache.get("a0") is not None
+    cache.put("a3", b"x" * 1000)
+    assert _files(tmp_path) == ["a0", "a2", "a3"]
+
+def test_disk_tier_ttl_removes_unused_files(tmp_path):
+    cache = ByteCache(0, str(tmp_path), disk_ttl_seconds=60)
+    cache.put("old", b"x")
+    os.utime(cache._disk_path("old"), (time.time() - 120, time.time() - 120))
+    # sweeps for expired files are throttled; pretend the last one was long ago
+    cache._disk_swept = 0.0
+    cache.put("new", b"y")
+    assert _files(tmp_path) == ["new"]
+    assert cache.get("old") is None
+
+def test_unbounded_disk_tier_keeps_everything(tmp_path):
+    cache = ByteCache(0, str(tmp_path))
+    for i in range(5):
+        cache.put(f"a{i}", b"x" * 1000)
+    assert len(_files(tmp_path)) == 5
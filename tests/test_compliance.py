@@ -0,0 +1,25 @@
+from app.services.compliance import DEFAULT_RULES, RuleSet
+
+def test_weak_phrase_removed_without_double_space():
+    cleaned, findings, has_cta = DEFAULT_RULES.check("Hi, just checking the next step.")
+    assert cleaned == "Hi, the next step."
+    assert [f.rule for f in findings] == ["weak_language", "cta"]
+    assert has_cta
+
+def test_positions_refer_to_input_and_case_is_kept():
+    text = "SORRY for the delay. Let's Schedule."
+    cleaned, findings, _ = DEFAULT_RULES.check(text)
+    assert [(text[f.start:f.end], f.rule) for f in findings] == [("SORRY", "weak_language"), ("Let's", "cta"), ("Schedule", "cta")]
+    assert cleaned == "for the delay. Let's Schedule."
+
+def test_longer_phrase_preferred_over_its_prefix():
+    rules = RuleSet(["hope", "hope you"], [])
+    cleaned, findings, _ = rules.check("I hope you are well")
+    assert [f.phrase for f in findings] == ["hope you"]
+    assert cleaned == "I are well"
+
+def test_empty_rule_set_matches_nothing():
+    assert RuleSet([], []).check("sorry, just checking") == ("sorry, just checking", [], False)
+
+def test_empty_text():
+    assert DEFAULT_RULES.check("") == ("", [], False)
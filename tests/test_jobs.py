@@ -0,0 +1,68 @@
+import collections
+import threading
+import time
+
+from app.services.jobs import JobQueue
+
+def _queue(path, runs, lease_seconds=60.0, delay=0.01):
+    lock = threading.Lock()
+
+    def runner(payload, outputs):
+        with lock:
+            runs[payload["n"]] += 1
+        time.sleep(delay)
+        return f"rid{payload['n']}", {"pdf": b"%PDF"}
+
+    return JobQueue(str(path), concurrency=2, max_queued=100, retention_seconds=3600, runner=runner, lease_seconds=lease_seconds)
+
+def _wait_done(queue, ids, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(queue.get(i)["status"] == "done" for i in ids):
+            return True
+        time.sleep(0.05)
+    return False
+
+def test_two_processes_on_one_file_run_each_job_once(tmp_path):
+    runs = collections.Counter()
+    a, b = _queue(tmp_path / "jobs.db", runs), _queue(tmp_path / "jobs.db", runs)
+    a.start()
+    ids = [a.submit({"n": n}, ["pdf"])["job_id"] for n in range(20)]
+    time.sleep(0.1)
+    b.start()
+    try:
+        assert _wait_done(a, ids)
+    finally:
+        a.stop()
+        b.stop()
+    assert runs == {n: 1 for n in range(20)}
+
+def test_starting_does_not_requeue_another_live_owners_job(tmp_path):
+    runs = collections.Counter()
+    a = _queue(tmp_path / "jobs.db", runs, delay=0.5)
+    a.start()
+    job_id = a.submit({"n": 0}, ["pdf"])["job_id"]
+    time.sleep(0.1)
+    b = _queue(tmp_path / "jobs.db", runs)
+    b.start()
+    try:
+        assert _wait_done(a, [job_id])
+    finally:
+        a.stop()
+        b.stop()
+    assert runs == {0: 1}
+
+def test_job_of_a_dead_owner_runs_again_after_its_lease(tmp_path):
+    runs = collections.Counter()
+    dead = _queue(tmp_path / "jobs.db", runs, lease_seconds=0.3)
+    job_id = dead.submit({"n": 0}, ["pdf"])["job_id"]
+    # claimed, then the process "dies" without finishing or renewing
+    with dead._lock:
+        assert dead._claim() is not None
+    b = _queue(tmp_path / "jobs.db", runs, lease_seconds=0.3)
+    b.start()
+    try:
+        assert _wait_done(b, [job_id])
+    finally:
+        b.stop()
+    assert runs == {0: 1}
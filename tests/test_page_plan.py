@@ -0,0 +1,29 @@
+import pytest
+
+from app.services.render import LAYOUT, _rows_fit, page_plan
+
+FIRST_LAST = _rows_fit(LAYOUT.table_top, LAYOUT.totals_floor)
+FIRST = _rows_fit(LAYOUT.table_top, LAYOUT.rows_floor) - 1
+CONT_LAST = _rows_fit(LAYOUT.cont_table_top, LAYOUT.totals_floor) - 1
+CONT = _rows_fit(LAYOUT.cont_table_top, LAYOUT.rows_floor) - 2
+
+@pytest.mark.parametrize("n", [0, 1, FIRST_LAST])
+def test_single_page(n):
+    assert page_plan(n) == [n]
+
+def test_one_past_a_single_page_keeps_an_item_with_the_totals():
+    assert page_plan(FIRST_LAST + 1) == [FIRST_LAST, 1]
+
+def test_full_continuation_page_moves_one_item_to_the_totals_page():
+    assert page_plan(FIRST + CONT) == [FIRST, CONT - 1, 1]
+
+# every count between a single page and three full pages, plus a long document
+@pytest.mark.parametrize("n", list(range(1, FIRST + 2 * CONT + 2)) + [1000, 12345])
+def test_plan_fits_every_page(n):
+    plan = page_plan(n)
+    assert sum(plan) == n
+    assert all(rows >= 1 for rows in plan)
+    if len(plan) > 1:
+        assert plan[0] <= FIRST
+        assert all(rows <= CONT for rows in plan[1:-1])
+        assert plan[-1] <= CONT_LAST
@@ -0,0 +1,36 @@
+import io
+
+import pikepdf
+import pytest
+
+from app.services.pdf_tools import can_linearize, pdf_stats
+from app.services.render import render_pdf
+from app.services.render_store import WARMUP_PAYLOAD
+
+@pytest.fixture(scope="module")
+def pdfs():
+    return {mode: render_pdf(WARMUP_PAYLOAD, mode) for mode in ("default", "compact", "linearized")}
+
+def test_compact_only_drops_ascii85(pdfs):
+    assert b"/ASCII85Decode" in pdfs["default"]
+    assert b"/ASCII85Decode" not in pdfs["compact"]
+    assert len(pdfs["compact"]) < len(pdfs["default"])
+    with pikepdf.open(io.BytesIO(pdfs["default"])) as a, pikepdf.open(io.BytesIO(pdfs["compact"])) as b:
+        assert [p.Contents.read_bytes() for p in a.pages] == [p.Contents.read_bytes() for p in b.pages]
+
+def test_linearized_round_trips_through_pdf_stats(pdfs):
+    assert can_linearize()
+    data = pdfs["linearized"]
+    with pikepdf.open(io.BytesIO(data)) as pdf:
+        assert pdf.is_linearized
+        assert len(pdf.pages) == 1
+    size, raw = pdf_stats(data)
+    assert size == len(data)
+    assert raw > size
+
+def test_linearized_is_deterministic():
+    assert render_pdf(WARMUP_PAYLOAD, "linearized") == render_pdf(WARMUP_PAYLOAD, "linearized")
+
+def test_default_mode_reports_no_flate_gain(pdfs):
+    # ASCII85 streams are not decoded, so they count at their stored size
+    assert pdf_stats(pdfs["default"]) == (len(pdfs["default"]), len(pdfs["default"]))
@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+
+import pytest
+
+from app.services.pool import RenderPool, RenderTimeout
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return os.getpid()
+
+def _alive(pid):
+    # a killed worker may linger as a zombie until the executor reaps it
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads /proc")
+def test_timeout_kills_only_the_stuck_worker():
+    pool = RenderPool(workers=2, max_pending=4, timeout=1.0, max_tasks_per_child=0)
+    try:
+        pool.warm(_sleep, 0)
+        started = time.monotonic()
+        with pytest.raises(RenderTimeout):
+            pool.run(_sleep, 60)
+        assert time.monotonic() - started < 10
+        # the timed-out job's slot is the last one handed back
+        stuck = pool._pids[pool._job_slots[-1]]
+        deadline = time.monotonic() + 5
+        while _alive(stuck) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert not _alive(stuck)
+        # the pool is replaced and keeps working
+        assert pool.run(_sleep, 0) != stuck
+    finally:
+        pool.shutdown()
@@ -0,0 +1,28 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.render_store import WARMUP_PAYLOAD
+
+client = TestClient(app)
+
+def test_post_with_matching_if_none_match_is_412_not_304():
+    first = client.post("/v1/render/invoice-quote?outputs=pdf", json=WARMUP_PAYLOAD)
+    assert first.status_code == 200
+    again = client.post("/v1/render/invoice-quote?outputs=pdf", json=WARMUP_PAYLOAD, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 412
+    assert again.headers["ETag"] == first.headers["ETag"]
+
+def test_get_image_revalidates_with_304():
+    rid = client.post("/v1/render/invoice-quote?outputs=pdf", json=WARMUP_PAYLOAD).json()["render_id"]
+    image = client.get(f"/v1/render/{rid}/image?profile=thumb")
+    assert image.status_code == 200
+    again = client.get(f"/v1/render/{rid}/image?profile=thumb", headers={"If-None-Match": image.headers["ETag"]})
+    assert again.status_code == 304
+
+def test_inconsistent_caller_totals_are_rejected():
+    bad = {**WARMUP_PAYLOAD, "total": 2.0}
+    assert client.post("/v1/render/invoice-quote?outputs=pdf", json=bad).status_code == 400
+    batch = client.post("/v1/render/batch", json={"items": [WARMUP_PAYLOAD, bad], "outputs": ["pdf"]})
+    assert batch.status_code == 400
+    assert batch.json()["detail"].startswith("items[1]: ")
+    assert client.post("/v1/render/jobs", json={**WARMUP_PAYLOAD, "subtotal": 3.0}).status_code == 400
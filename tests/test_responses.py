@@ -0,0 +1,29 @@
+import pytest
+
+from app.responses import _disposition, binary_response
+
+@pytest.mark.parametrize("filename, expected", [
+    ("INV-2024-001.pdf", 'inline; filename="INV-2024-001.pdf"'),
+    ('a"b\\c.pdf', 'inline; filename="abc.pdf"'),
+    ("INV-été.pdf", "inline; filename=\"INV-_t_.pdf\"; filename*=UTF-8''INV-%C3%A9t%C3%A9.pdf"),
+    ("請求書 1.png", "inline; filename=\"___ 1.png\"; filename*=UTF-8''%E8%AB%8B%E6%B1%82%E6%9B%B8%201.png"),
+    ("line\nbreak.pdf", 'inline; filename="linebreak.pdf"'),
+])
+def test_disposition(filename, expected):
+    assert _disposition(filename) == expected
+
+def test_non_ascii_filename_header_is_latin1_safe():
+    response = binary_response(b"%PDF", "application/pdf", "INV-é€.pdf", {})
+    value = response.headers["content-disposition"]
+    value.encode("latin-1")
+    assert "filename*=UTF-8''INV-%C3%A9%E2%82%AC.pdf" in value
+
+def test_non_ascii_doc_number_renders_as_pdf():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from app.services.render_store import WARMUP_PAYLOAD
+
+    r = TestClient(app).post("/v1/render/invoice-quote", json={**WARMUP_PAYLOAD, "doc_number": "FACT-2024-é"}, headers={"Accept": "application/pdf"})
+    assert r.status_code == 200
+    assert r.headers["content-disposition"] == "inline; filename=\"FACT-2024-_.pdf\"; filename*=UTF-8''FACT-2024-%C3%A9.pdf"
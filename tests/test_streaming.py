@@ -0,0 +1,35 @@
+import io
+
+import pytest
+
+from app import streaming
+from app.streaming import ItemError, iter_json_items
+
+def _items(body: bytes):
+    return [("error", str(x)) if isinstance(x, ItemError) else x for x in iter_json_items(io.BytesIO(body))]
+
+@pytest.mark.parametrize("body, expected", [
+    (b"[]", []),
+    (b" \n[ ] ", []),
+    (b"[1,2,3]", [1, 2, 3]),
+    (b'[ 1 ,\n{"a": [1, 2]} , "x" ]', [1, {"a": [1, 2]}, "x"]),
+    (b"[1, 2 3]", [1, 2, ("error", "Invalid JSON array: expected ',' or ']' after an item, got '3'")]),
+    (b"[1,,2]", [1, ("error", "Invalid JSON array: expected an item, got ','")]),
+    (b"[,1]", [("error", "Invalid JSON array: expected an item, got ','")]),
+    (b"[1,]", [1, ("error", "Invalid JSON array: expected an item, got ']'")]),
+    (b"[1, 2", [1, 2, ("error", "Unterminated JSON array")]),
+])
+@pytest.mark.parametrize("read_size", [1, 3, 64 * 1024])
+def test_array_separators(monkeypatch, body, expected, read_size):
+    monkeypatch.setattr(streaming, "READ_SIZE", read_size)
+    assert _items(body) == expected
+
+@pytest.mark.parametrize("split", range(1, 8))
+def test_number_split_across_a_chunk_boundary(monkeypatch, split):
+    # "[12345678]" read in chunks of `split` characters: the number must not be
+    # taken while more of its digits may follow in the next chunk
+    monkeypatch.setattr(streaming, "READ_SIZE", split)
+    assert _items(b"[12345678, -9.5e3]") == [12345678, -9500.0]
+
+def test_ndjson_lines():
+    assert _items(b'{"a": 1}\n\nnot json\n[2]') == [{"a": 1}, ("error", "Invalid JSON: Expecting value: line 1 column 1 (char 0)"), [2]]
@@ -0,0 +1,56 @@
+import pytest
+
+from app.services import totals
+from app.services.totals import VECTORIZE_MIN_ITEMS, line_cents
+
+def _decimal(units, qtys):
+    # below VECTORIZE_MIN_ITEMS, one pair at a time, always takes the Decimal path
+    return [line_cents([u], [q])[0] for u, q in zip(units, qtys)]
+
+def _padded(units, qtys):
+    # enough items to take the NumPy path
+    n = VECTORIZE_MIN_ITEMS - len(units)
+    return list(units) + [1.0] * n, list(qtys) + [1] * n
+
+@pytest.mark.parametrize("unit, qty, cents", [
+    (19.99, 3, 5997),
+    (0.005, 1, 1),
+    (-0.005, 1, -1),
+    (1.005, 1, 101),
+    (0.125, 0.1, 1),
+    (-0.125, 0.1, -1),
+    (2.5, -2, -500),
+    (0.0, 7, 0),
+])
+def test_decimal_path_rounds_half_up_away_from_zero(unit, qty, cents):
+    assert line_cents([unit], [qty]) == [cents]
+
+@pytest.mark.parametrize("units, qtys", [
+    # cents and whole quantities: scales 100 and 1
+    ([19.99, -3.5, 0.01], [3, 2, -7]),
+    # half cents from four-decimal prices: unit scale 10_000
+    ([0.005, -0.005, 1.0125, -1.0125], [1, 1, 1, 1]),
+    # fractional quantities: qty scale 1_000
+    ([0.125, 9.99, -0.125], [0.1, 1.5, 0.001]),
+])
+def test_numpy_path_matches_decimal_path(units, qtys):
+    pytest.importorskip("numpy")
+    u, q = _padded(units, qtys)
+    assert totals._numpy() is not None
+    assert totals._line_cents_vectorized(u, q) is not None
+    assert line_cents(u, q) == _decimal(u, q)
+
+@pytest.mark.parametrize("units, qtys", [
+    # more than four decimals on a price
+    ([0.00001], [1]),
+    # more than three decimals on a quantity
+    ([1.0], [0.0001]),
+    # too large for exact int64 products
+    ([1e15], [1e6]),
+])
+def test_unscalable_values_fall_back_to_decimal(units, qtys):
+    pytest.importorskip("numpy")
+    u, q = _padded(units, qtys)
+    assert totals._numpy() is not None
+    assert totals._line_cents_vectorized(u, q) is None
+    assert line_cents(u, q) == _decimal(u, q)